@@ -0,0 +1,102 @@
+"""
+Micro-benchmark de l'extraction d'URL média des entrées RSS.
+
+Compare le scan rapide (find_first_image_src) à l'ancien parsing BeautifulSoup complet
+sur un corpus d'entrées de flux sauvegardé.
+
+Usage (depuis la racine du dépôt) :
+    python benchmarks/bench_extract_media_url.py [--repeat 200]
+    python benchmarks/bench_extract_media_url.py --save-corpus   # Rafraîchit le corpus depuis les flux configurés
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import feedparser
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import rss_publisher  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rss_entries_corpus.json")
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        entries = json.load(f)
+    # FeedParserDict pour retrouver l'accès par attribut (entry.media_content, media.url)
+    corpus = []
+    for entry in entries:
+        if 'media_content' in entry:
+            entry['media_content'] = [feedparser.FeedParserDict(media) for media in entry['media_content']]
+        corpus.append(feedparser.FeedParserDict(entry))
+    return corpus
+
+
+def save_corpus():
+    """Enregistre les entrées brutes des flux configurés (champs utiles à l'extraction uniquement)."""
+    entries = []
+    for url in rss_publisher.RSS_FEED_URLS:
+        feed = feedparser.parse(url, agent=rss_publisher.RSS_USER_AGENT)
+        for entry in feed.entries:
+            saved = {key: entry[key] for key in ('title', 'link', 'description', 'summary') if key in entry}
+            if 'media_content' in entry:
+                saved['media_content'] = [dict(media) for media in entry.media_content]
+            if 'content' in entry:
+                saved['content'] = [{'value': c.get('value', '')} for c in entry.content]
+            entries.append(saved)
+    with open(CORPUS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"{len(entries)} entrées enregistrées dans {CORPUS_PATH}")
+
+
+def extract_with_soup(entry):
+    """Ancienne implémentation : arbre BeautifulSoup complet pour chaque description."""
+    if 'media_content' in entry:
+        for media in entry.media_content:
+            if 'url' in media and media.get('type', '').startswith(('image/', 'video/')):
+                return media.url
+    content_html = entry.get('description', '') or entry.get('summary', '') or entry.get('content', [{}])[0].get('value', '')
+    if content_html:
+        img_tag = BeautifulSoup(content_html, 'html.parser').find('img')
+        if img_tag and img_tag.get('src'):
+            return img_tag['src']
+    return None
+
+
+def bench(label, extractor, entries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in entries:
+            extractor(entry)
+    elapsed = time.perf_counter() - start
+    per_entry_us = elapsed / (repeat * len(entries)) * 1e6
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms au total   {per_entry_us:8.1f} µs / entrée")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Nombre de passes sur le corpus")
+    parser.add_argument("--save-corpus", action="store_true", help="Rafraîchit le corpus depuis les flux RSS configurés")
+    args = parser.parse_args()
+
+    if args.save_corpus:
+        save_corpus()
+        sys.exit(0)
+
+    entries = load_corpus()
+
+    # Les deux implémentations doivent trouver les mêmes URLs sur le corpus
+    for entry in entries:
+        fast, reference = rss_publisher.extract_media_url_from_entry(entry), extract_with_soup(entry)
+        if fast != reference:
+            print(f"⚠️ Résultat différent pour '{entry.get('title')}': {fast!r} != {reference!r}")
+
+    print(f"Corpus : {len(entries)} entrées x {args.repeat} passes")
+    soup_time = bench("BeautifulSoup (html.parser)", extract_with_soup, entries, args.repeat)
+    fast_time = bench("Scan rapide (regex)", rss_publisher.extract_media_url_from_entry, entries, args.repeat)
+    print(f"Accélération : x{soup_time / fast_time:.1f}")
@@ -0,0 +1,172 @@
+import os
+import io
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import llm_cache
+from gcp_clients import get_gemini_client, get_gcs_bucket
+from gcs_upload import upload_content_addressed
+from graph_client import GraphAPIError, get_graph_client
+
+# --- 1. Configuration et Clés (Secrets GitHub) ---
+PAGE_ID = os.getenv("FB_PAGE_ID")
+ACCESS_TOKEN = os.getenv("FB_ACCESS_TOKEN")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GCS_SERVICE_ACCOUNT_KEY = os.getenv("GCS_SERVICE_ACCOUNT_KEY")
+
+GCS_BUCKET_NAME = "media-auto-instagram"
+SESSIONS_DIR = "generated_images"
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Instagram n'accepte que du JPEG, avec un ratio entre 4:5 et 1.91:1 : les scènes 9:16
+# sont recadrées au centre en 4:5 avant le téléversement.
+CAROUSEL_ASPECT_RATIO = 4 / 5
+JPEG_QUALITY = 92
+
+# --- 2. Préparation des médias ---
+
+def find_latest_session(sessions_dir=SESSIONS_DIR):
+    """Retourne le dossier session_* le plus récent."""
+    sessions = sorted(d for d in os.listdir(sessions_dir) if d.startswith("session_"))
+    return os.path.join(sessions_dir, sessions[-1]) if sessions else None
+
+def list_session_images(session_dir):
+    """Images de scène de la session, dans l'ordre (scene_1, scene_2, ...)."""
+    images = [f for f in os.listdir(session_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    images.sort(key=lambda name: (len(name), name))
+    return [os.path.join(session_dir, name) for name in images]
+
+def prepare_carousel_image(path):
+    """Recadre l'image au centre au ratio du carrousel et l'encode en JPEG (octets)."""
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        width, height = img.size
+        if width / height < CAROUSEL_ASPECT_RATIO:
+            new_height = int(width / CAROUSEL_ASPECT_RATIO)
+            top = (height - new_height) // 2
+            img = img.crop((0, top, width, top + new_height))
+        elif width / height > CAROUSEL_ASPECT_RATIO:
+            new_width = int(height * CAROUSEL_ASPECT_RATIO)
+            left = (width - new_width) // 2
+            img = img.crop((left, 0, left + new_width, height))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return buffer.getvalue()
+
+def upload_session_images(image_paths):
+    """
+    Téléverse les scènes vers GCS en parallèle et retourne leurs URLs publiques (dans l'ordre),
+    ou None si une image n'a pas pu être téléversée (aucun conteneur n'est alors créé).
+    """
+    try:
+        bucket = get_gcs_bucket(GCS_BUCKET_NAME)
+    except Exception as e:
+        print(f"❌ Accès au bucket GCS impossible : {e}")
+        return None
+
+    def upload(path):
+        blob, uploaded = upload_content_addressed(bucket, prepare_carousel_image(path), "carousel", ".jpg", "image/jpeg")
+        print(f"✅ {'Téléversé' if uploaded else 'Déjà présent'} : {blob.public_url}")
+        return blob.public_url
+
+    with ThreadPoolExecutor(max_workers=len(image_paths)) as pool:
+        futures = [pool.submit(upload, path) for path in image_paths]
+
+    media_urls, failed = [], []
+    for path, future in zip(image_paths, futures):
+        try:
+            media_urls.append(future.result())
+        except Exception as e:
+            print(f"❌ Échec du téléversement de {os.path.basename(path)} : {e}")
+            failed.append(path)
+    if failed:
+        print(f"❌ {len(failed)}/{len(image_paths)} image(s) non téléversée(s) : carrousel abandonné avant la création des conteneurs.")
+        return None
+    return media_urls
+
+def generate_caption(image_count, session_name=None):
+    """
+    Génère la légende du carrousel via Gemini (légende de secours sinon). La réponse est mise
+    en cache par session : relancer la publication d'une même session réutilise sa légende.
+    """
+    try:
+        client = get_gemini_client()
+        prompt = (
+            f"Génère une légende Instagram élégante pour un carrousel de {image_count} photos "
+            "au style 'Old Money' : luxe discret, paysages grandioses, élégance intemporelle. "
+            "Ton inspirant, 80 mots maximum, termine par 5 hashtags pertinents."
+        )
+        caption = llm_cache.cached_generate(
+            GEMINI_MODEL,
+            prompt,
+            lambda: client.models.generate_content(model=GEMINI_MODEL, contents=prompt).text,
+            params={"session": session_name}
+        )
+        return caption.strip()
+    except Exception as e:
+        print(f"Erreur de génération IA : {e}")
+        return "✨ Élégance intemporelle. #OldMoney #QuietLuxury #Lifestyle"
+
+# --- 3. Publication Instagram ---
+
+def publish_instagram_carousel(media_urls, caption):
+    """Publie le carrousel (enfants créés et traités en parallèle, puis conteneur parent)."""
+    print(f"\n--- Début de la publication du carrousel ({len(media_urls)} images) sur Instagram ---")
+    graph = get_graph_client(ACCESS_TOKEN)
+    try:
+        insta_id = graph.get_instagram_business_id(PAGE_ID)
+        if not insta_id:
+            print("❌ Erreur: Compte Instagram Business non trouvé.")
+            return False
+        media_id = graph.publish_carousel(insta_id, media_urls, caption)
+    except (GraphAPIError, ValueError) as e:
+        print(f"❌ Échec de la publication du carrousel : {e}")
+        if getattr(e, "payload", None):
+            print("Erreur Meta (Carrousel):", json.dumps(e.payload, indent=4))
+        return False
+
+    print("\n" + "="*50)
+    print("✅ PUBLICATION CARROUSEL INSTAGRAM DÉCLENCHÉE AVEC SUCCÈS !")
+    print(f"Publication ID: {media_id}")
+    print("==================================================")
+    return True
+
+# --- 4. Main Execution ---
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publie les scènes d'une session en carrousel Instagram.")
+    parser.add_argument("session_dir", nargs="?", help="Dossier de session (défaut : la session la plus récente)")
+    parser.add_argument("--caption", help="Légende à utiliser (défaut : générée par Gemini)")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Ignore le cache disque des réponses Gemini (équivalent à LLM_CACHE_BYPASS=1)")
+    args = parser.parse_args()
+    if args.no_llm_cache:
+        llm_cache.LLM_CACHE_BYPASS = True
+
+    if not all([PAGE_ID, ACCESS_TOKEN, GCS_SERVICE_ACCOUNT_KEY]):
+        print("Erreur : Les Secrets GitHub ne sont pas définis (FB et GCS KEY requis).")
+        sys.exit(1)
+
+    session_dir = args.session_dir or find_latest_session()
+    if not session_dir or not os.path.isdir(session_dir):
+        print(f"❌ Dossier de session introuvable : {session_dir}")
+        sys.exit(1)
+
+    image_paths = list_session_images(session_dir)[:10]
+    print(f"--- Session : {session_dir} ({len(image_paths)} images) ---")
+    if len(image_paths) < 2:
+        print("❌ Il faut au moins 2 images pour un carrousel.")
+        sys.exit(1)
+
+    media_urls = upload_session_images(image_paths)
+    if not media_urls:
+        sys.exit(1)
+    caption = args.caption or generate_caption(len(media_urls), os.path.basename(os.path.normpath(session_dir)))
+    print(f"Légende générée (début) : {caption[:50]}...")
+
+    if not publish_instagram_carousel(media_urls, caption):
+        sys.exit(1)
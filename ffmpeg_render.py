@@ -0,0 +1,122 @@
+"""
+Moteur de rendu ffmpeg natif pour les Reels diaporama.
+
+La timeline (reel_timeline.ReelTimeline) est compilée en un seul filter graph exécuté par un
+sous-processus ffmpeg, au lieu de composer chaque image de sortie en Python avec MoviePy :
+- chaque image est décodée, recadrée au format de sortie et convertie en yuv420p une seule fois,
+  puis répétée par le filtre `loop` (et non relue à chaque image comme avec `-loop 1`) ;
+- textes : rendus une fois en PNG transparent (text_overlay), puis posés avec `overlay`
+  (n'exige pas `drawtext`, absent de certaines builds statiques de ffmpeg) ; sans zoom,
+  ils sont incrustés une seule fois avant la répétition de l'image ;
+- zoom avant progressif : `zoompan` sur l'image suréchantillonnée une fois (ZOOM_SUPERSAMPLE),
+  pour que l'arrondi à l'entier des coordonnées de recadrage ne produise pas de saccades ;
+- fondus enchaînés : chaîne de `xfade`, le fondu k commençant au début de la scène k.
+"""
+import os
+import shutil
+import tempfile
+import subprocess
+
+from reel_timeline import ReelTimeline
+from text_overlay import text_patch_image
+
+RENDER_CRF = 18
+RENDER_PRESET = "medium"
+ZOOM_SUPERSAMPLE = 4
+
+
+def get_ffmpeg_exe():
+    """Binaire ffmpeg : celui d'imageio-ffmpeg (installé avec MoviePy), sinon celui du PATH."""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def render_text_overlay(overlay, path):
+    """Écrit le patch RGBA d'un TextOverlay (rastérisé une seule fois, voir text_overlay) en PNG."""
+    text_patch_image(overlay).save(path)
+    return path
+
+
+def _scene_chain(index, scene, width, height, fps, overlay_inputs):
+    """Filtres d'une scène : cadrage, textes, répétition de l'image, zoom, format commun exigé par xfade."""
+    fit = f"[{index}:v]scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}"
+    repeat = f"loop=loop=-1:size=1,settb=AVTB,setpts=N/{fps}/TB,fps={fps},trim=duration={scene.duration:.3f}"
+
+    def overlays(chain):
+        for j, (input_index, overlay) in enumerate(overlay_inputs):
+            x, y = int(overlay.position[0] * width), int(overlay.position[1] * height)
+            chain += f"[s{index}t{j}];[s{index}t{j}][{input_index}:v]overlay=x={x}:y={y}"
+        return chain
+
+    if not scene.zoom_rate:
+        # Image et textes fixes : composés une fois, puis répétés
+        return overlays(fit) + f",setsar=1,format=yuv420p,{repeat}[s{index}]"
+
+    # Une taille de sortie variable (scale eval=frame) casserait le crop centré : zoompan garde
+    # une taille fixe, et le suréchantillonnage donne une précision de 1/ZOOM_SUPERSAMPLE pixel.
+    supersampled = f"scale={width * ZOOM_SUPERSAMPLE}:{height * ZOOM_SUPERSAMPLE}:flags=bicubic"
+    zoompan = (
+        f"zoompan=z='1+{scene.zoom_rate}*in_time':x='iw/2-iw/zoom/2':y='ih/2-ih/zoom/2'"
+        f":d=1:s={width}x{height}:fps={fps}"
+    )
+    chain = fit + f",{supersampled},setsar=1,{repeat},{zoompan}"
+    return overlays(chain) + f",setsar=1,format=yuv420p[s{index}]"
+
+
+def build_ffmpeg_command(timeline, output_path, overlay_dir, crf=RENDER_CRF, preset=RENDER_PRESET, threads=None):
+    """Construit la ligne de commande ffmpeg (entrées, filter graph, encodage) de la timeline."""
+    timeline.validate()
+    width, height = timeline.frame_size()
+    fps = timeline.fps
+
+    args = [get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y"]
+    for scene in timeline.scenes:
+        args += ["-framerate", str(fps), "-i", scene.image_path]
+
+    # Les PNG des textes sont des entrées supplémentaires (une image, répétée par overlay)
+    next_input = len(timeline.scenes)
+    chains = []
+    for i, scene in enumerate(timeline.scenes):
+        overlay_inputs = []
+        for j, overlay in enumerate(scene.overlays):
+            path = render_text_overlay(overlay, os.path.join(overlay_dir, f"text_{i}_{j}.png"))
+            args += ["-i", path]
+            overlay_inputs.append((next_input, overlay))
+            next_input += 1
+        chains.append(_scene_chain(i, scene, width, height, fps, overlay_inputs))
+
+    count = len(timeline.scenes)
+    if count == 1:
+        chains.append("[s0]null[out]")
+    elif timeline.transition > 0:
+        current = "s0"
+        for k, start in enumerate(timeline.start_times()[1:], start=1):
+            label = "out" if k == count - 1 else f"x{k}"
+            chains.append(
+                f"[{current}][s{k}]xfade=transition=fade:duration={timeline.transition:.3f}:offset={start:.3f}[{label}]"
+            )
+            current = label
+    else:
+        chains.append("".join(f"[s{i}]" for i in range(count)) + f"concat=n={count}:v=1:a=0[out]")
+
+    args += ["-filter_complex", ";".join(chains), "-map", "[out]", "-r", str(fps)]
+    args += ["-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p", "-movflags", "+faststart"]
+    if threads:
+        args += ["-threads", str(threads)]
+    args += ["-t", f"{timeline.duration:.3f}", output_path]
+    return args
+
+
+def render_timeline(timeline: ReelTimeline, output_path, crf=RENDER_CRF, preset=RENDER_PRESET, threads=None):
+    """Rend la timeline en MP4 (H.264, yuv420p) avec un seul processus ffmpeg. Lève RuntimeError en cas d'échec."""
+    with tempfile.TemporaryDirectory(prefix="reel_overlays_") as overlay_dir:
+        command = build_ffmpeg_command(timeline, output_path, overlay_dir, crf, preset, threads)
+        print(f"--- [LOG] Rendu ffmpeg : {len(timeline.scenes)} scènes, {timeline.duration:.1f}s à {timeline.fps} fps ---")
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg a échoué (code {result.returncode}) : {stderr[-2000:]}")
+    return output_path
@@ -0,0 +1,118 @@
+"""
+Cache disque des images sources décodées et recadrées, lues par memory-map.
+
+Chaque image (PNG Imagen pleine taille) est décodée et recadrée une seule fois à la taille de
+sortie, puis stockée en uint8 brut (.npy) sous une clé (empreinte SHA-256 du fichier, taille).
+Les rendus suivants de la même session — relance, autre moteur, autre variante — mappent le
+fichier en lecture seule sans copie : plus aucun décodage PNG, et les pages sont partagées
+entre processus (rendu segmenté) via le cache du système.
+- LRU borné (media_cache.evict_lru) : au-delà de FRAME_CACHE_MAX_MB, les entrées les moins
+  récemment lues sont supprimées.
+- Contournement : FRAME_CACHE_BYPASS=1 décode et recadre en mémoire, sans rien écrire.
+"""
+import os
+import hashlib
+import threading
+
+import numpy as np
+from PIL import Image
+
+from media_cache import MEDIA_CACHE_DIR, evict_lru, touch
+from video_effects import fit_image
+
+FRAME_CACHE_DIR = os.path.join(MEDIA_CACHE_DIR, "frames")
+FRAME_CACHE_MAX_MB = int(os.getenv("FRAME_CACHE_MAX_MB", 2048))
+FRAME_CACHE_BYPASS = os.getenv("FRAME_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_digests = {}
+
+
+def file_digest(path):
+    """SHA-256 du contenu du fichier, recalculé seulement si sa taille ou sa date de modification change."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        _digests[memo_key] = digest.hexdigest()
+    return _digests[memo_key]
+
+
+def _entry_path(path, size):
+    width, height = size
+    return os.path.join(FRAME_CACHE_DIR, f"{file_digest(path)[:32]}_{width}x{height}.npy")
+
+
+def decode_source(path):
+    """Image source décodée en RGB (fichier refermé aussitôt)."""
+    with Image.open(path) as img:
+        return img.convert("RGB")
+
+
+def _decode_fitted(path, size, decode=None):
+    source = decode() if decode is not None else decode_source(path)
+    return np.asarray(fit_image(source, size))
+
+
+def _load(entry_path, size):
+    width, height = size
+    try:
+        frame = np.load(entry_path, mmap_mode="r")
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+    if frame.shape != (height, width, 3) or frame.dtype != np.uint8:
+        return None
+    return frame
+
+
+def cached_frame(path, size, bypass=None, decode=None):
+    """
+    Image `path` recadrée à `size` (largeur, hauteur) : tableau (hauteur, largeur, 3) uint8
+    en lecture seule, mappé depuis le cache disque (créé au premier appel).
+    `decode` (optionnel) fournit l'image source PIL RGB déjà décodée par l'appelant, utilisée
+    seulement si l'entrée manque : plusieurs tailles d'une même image ne décodent le PNG qu'une fois.
+    """
+    size = tuple(size)
+    bypass = FRAME_CACHE_BYPASS if bypass is None else bypass
+    if bypass:
+        return _decode_fitted(path, size, decode)
+
+    entry_path = _entry_path(path, size)
+    frame = _load(entry_path, size)
+    if frame is not None:
+        touch(entry_path)
+        return frame
+
+    frame = np.ascontiguousarray(_decode_fitted(path, size, decode))
+    frame.flags.writeable = False
+    tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.save(f, frame)
+        os.replace(tmp_path, entry_path)
+    except OSError as e:
+        # Disque plein ou cache en lecture seule : l'image décodée sert telle quelle
+        print(f"    Avertissement : impossible d'écrire le cache d'images ({e}).")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return frame
+    _evict(keep=entry_path)
+    # Entrée supprimée entre-temps (éviction par un autre processus) : l'image décodée sert telle quelle
+    mapped = _load(entry_path, size)
+    return frame if mapped is None else mapped
+
+
+def cached_image(path, size, bypass=None):
+    """Même image en PIL (copie en mémoire, pour les traitements PIL comme le Ken Burns)."""
+    return Image.fromarray(cached_frame(path, size, bypass))
+
+
+def _evict(keep=None):
+    """Ramène le cache sous FRAME_CACHE_MAX_MB, sans supprimer `keep` (entrée tout juste écrite)."""
+    evict_lru(FRAME_CACHE_DIR, ".npy", max_bytes=FRAME_CACHE_MAX_MB * 1024 * 1024, keep=keep)
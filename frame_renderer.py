@@ -0,0 +1,374 @@
+"""
+Rendu d'une ReelTimeline image par image en NumPy, et rendu segmenté multi-processus.
+
+TimelineRenderer calcule l'image de sortie à un instant donné : image de scène préparée une
+fois (recadrage, textes incrustés), zoom Ken Burns précalculé, fondu enchaîné par mélange
+linéaire — la même sémantique que les moteurs MoviePy et ffmpeg.
+
+Rendu segmenté : la timeline est découpée en segments par scène (partie fixe) et par fondu
+(segment court à part). Chaque segment est rendu et encodé par un processus du pool (un
+encodeur x264 par segment), puis les segments sont joints par le concat demuxer de ffmpeg
+en copie de flux, sans réencodage. Les segments ayant les mêmes paramètres d'encodage et
+commençant chacun par une image clé, la jointure est exacte. Un segment de partie fixe (image
+sans zoom, textes incrustés) n'est pas composé image par image : son unique image est envoyée une
+fois à ffmpeg, convertie en yuv420p une fois puis répétée par le filtre `loop` à la cadence de
+sortie. Seuls les fondus et les zooms sont rendus à pleine cadence ; la sortie reste en CFR.
+
+Rendu multi-variantes : plusieurs déclinaisons (VariantSpec : rythme, textes, fps, format
+9:16 / 4:5 / 1:1) d'un même jeu d'images sont rendues en une seule passe. Les PNG sont décodés
+une fois, chaque recadrage (image, taille) et chaque image fixe avec textes n'est calculé
+qu'une fois (SourceImages), et chaque variante alimente son propre encodeur ffmpeg.
+
+Flux vers l'encodeur (EncoderStream) : les images sont produites une à une dans des tampons
+préalloués et réutilisés, puis écrites sur l'entrée standard de ffmpeg par un thread dédié au
+travers d'une file bornée. Composition et encodage se recouvrent, et la mémoire de pointe reste
+de quelques images quelle que soit la durée du Reel ou son nombre de scènes.
+"""
+import os
+import queue
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from ffmpeg_render import RENDER_CRF, RENDER_PRESET, get_ffmpeg_exe
+from frame_cache import cached_frame, decode_source
+from text_overlay import composite_text_overlays
+from video_effects import KenBurns
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 0)) or os.cpu_count() or 1
+STREAM_QUEUE_SIZE = 4   # Images en attente d'écriture vers ffmpeg
+# Parties fixes : recherche de mouvement minimale (images identiques). Ces options ne changent
+# pas les en-têtes SPS/PPS, les segments restent joignables en copie de flux.
+HOLD_X264_PARAMS = "subme=1:me=dia:trellis=0:rc-lookahead=10"
+
+
+class SourceImages:
+    """
+    Images sources partagées entre rendus : chaque recadrage (image, taille) est lu une fois
+    depuis le cache disque memory-mappé (frame_cache, sans décodage PNG après le premier rendu),
+    et chaque image fixe avec textes est calculée une fois puis réutilisée. Sur un cache froid,
+    le PNG décodé est gardé en mémoire : toutes les tailles (variantes) partent du même décodage.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self._fitted = {}
+        self._stills = {}
+
+    def source(self, path):
+        """Image source décodée (PIL RGB), décodée au premier recadrage manquant du cache."""
+        if path not in self._sources:
+            self._sources[path] = decode_source(path)
+        return self._sources[path]
+
+    def frame(self, path, size):
+        """Recadrage en tableau uint8 en lecture seule (mappé, sans copie)."""
+        return cached_frame(path, size, decode=lambda: self.source(path))
+
+    def fitted(self, path, size):
+        """Recadrage en image PIL (tampon du Ken Burns)."""
+        key = (path, tuple(size))
+        if key not in self._fitted:
+            self._fitted[key] = Image.fromarray(self.frame(path, size))
+        return self._fitted[key]
+
+    def still(self, path, size, overlays):
+        """Image fixe recadrée avec ses textes incrustés (tableau en lecture seule)."""
+        key = (path, tuple(size), repr(overlays))
+        if key not in self._stills:
+            # Sans texte, le tableau mappé est utilisé tel quel ; sinon une copie reçoit les textes
+            frame = composite_text_overlays(self.frame(path, size), overlays, in_place=True)
+            frame.flags.writeable = False
+            self._stills[key] = frame
+        return self._stills[key]
+
+
+class TimelineRenderer:
+    """Images RGB (hauteur, largeur, 3) uint8 d'une ReelTimeline, indexées par numéro d'image."""
+
+    def __init__(self, timeline, sources=None):
+        timeline.validate()
+        self.timeline = timeline
+        self.sources = sources or SourceImages()
+        self.fps = timeline.fps
+        self.size = timeline.frame_size()
+        self.starts = timeline.start_times()
+        self.frame_count = int(round(timeline.duration * self.fps))
+        self._scenes = {}
+        self._blend = None
+
+    def _scene(self, index):
+        """Préparation paresseuse d'une scène : chaque processus ne charge que les images de ses segments."""
+        if index not in self._scenes:
+            scene = self.timeline.scenes[index]
+            if scene.zoom_rate:
+                zoom_end = 1.0 + scene.zoom_rate * scene.duration
+                buffer = self.sources.fitted(scene.image_path, self.size)
+                self._scenes[index] = KenBurns(scene.image_path, self.size, scene.duration, self.fps, 1.0, zoom_end, buffer=buffer)
+            else:
+                # Image fixe : les textes sont incrustés une seule fois
+                self._scenes[index] = self.sources.still(scene.image_path, self.size, scene.overlays)
+        return self._scenes[index]
+
+    def scene_frame(self, index, local_t, out=None):
+        prepared = self._scene(index)
+        if isinstance(prepared, np.ndarray):
+            return prepared
+        # Zoom écrit dans `out` ou dans le tampon de la scène, réécrit à chaque image : textes incrustés sans copie
+        return composite_text_overlays(prepared.frame(local_t, out), self.timeline.scenes[index].overlays, in_place=True)
+
+    def active_scenes(self, t):
+        """Scènes visibles à l'instant t : [(index, opacité)], la plus ancienne d'abord."""
+        transition = self.timeline.transition
+        for k in range(len(self.starts) - 1, -1, -1):
+            if t >= self.starts[k] or k == 0:
+                if k > 0 and transition > 0 and t < self.starts[k] + transition:
+                    alpha = (t - self.starts[k]) / transition
+                    return [(k - 1, 1.0 - alpha), (k, alpha)]
+                return [(k, 1.0)]
+
+    def frame(self, frame_index, out=None):
+        """
+        Image `frame_index`. Une image fixe est retournée telle quelle (tableau partagé, lecture
+        seule) ; un zoom ou un fondu est écrit dans `out` (tampon uint8 réutilisable) s'il est fourni.
+        """
+        t = frame_index / self.fps
+        layers = self.active_scenes(t)
+        if len(layers) == 1:
+            index, _ = layers[0]
+            return self.scene_frame(index, t - self.starts[index], out)
+        (prev_index, _), (index, alpha) = layers
+        previous = self.scene_frame(prev_index, t - self.starts[prev_index])
+        current = self.scene_frame(index, t - self.starts[index])
+        if self._blend is None:
+            self._blend = np.empty(previous.shape, dtype=np.float32)
+        # previous + (current - previous) * alpha, arrondi, sans tableau intermédiaire
+        blend = self._blend
+        np.subtract(current, previous, out=blend, dtype=np.float32)
+        blend *= alpha
+        blend += previous
+        blend += 0.5
+        if out is None:
+            out = np.empty(previous.shape, dtype=np.uint8)
+        np.copyto(out, blend, casting="unsafe")
+        return out
+
+    def hold_frame(self, frame_range):
+        """
+        Image commune à toutes les images de la plage si elle n'affiche qu'une scène fixe
+        (sans zoom ni fondu), sinon None.
+        """
+        first, end = frame_range
+        layers = [self.active_scenes(i / self.fps) for i in (first, end - 1)]
+        if any(len(scene_layers) != 1 for scene_layers in layers) or layers[0][0][0] != layers[1][0][0]:
+            return None
+        prepared = self._scene(layers[0][0][0])
+        return prepared if isinstance(prepared, np.ndarray) else None
+
+    def segments(self):
+        """
+        Découpage en plages d'images [début, fin) : partie fixe de chaque scène, et chaque fondu
+        en segment séparé. Les bornes sont arrondies à l'image près.
+        """
+        transition = self.timeline.transition
+        bounds = {0, self.frame_count}
+        for start in self.starts[1:]:
+            bounds.add(int(round(start * self.fps)))
+            if transition > 0:
+                bounds.add(int(round((start + transition) * self.fps)))
+        bounds = sorted(b for b in bounds if 0 <= b <= self.frame_count)
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _encoder_command(size, fps, output_path, crf, preset, threads=0, hold_frames=None):
+    """Encodeur rawvideo → H.264 ; avec hold_frames, une seule image en entrée est répétée hold_frames fois."""
+    width, height = size
+    filters = []
+    if hold_frames:
+        # Conversion yuv420p une seule fois, puis répétition à la cadence de sortie (CFR)
+        filters = ["-vf", f"format=yuv420p,loop=loop={hold_frames - 1}:size=1,setpts=N/{fps}/TB",
+                   "-r", str(fps), "-frames:v", str(hold_frames), "-x264-params", HOLD_X264_PARAMS]
+    return [
+        get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        *filters,
+        "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+        "-threads", str(threads), output_path,
+    ]
+
+
+class EncoderStream:
+    """
+    Encodeur ffmpeg alimenté en images brutes par un thread d'écriture. Les images passent par
+    une file bornée ; les tampons de composition sont préalloués et recyclés une fois écrits.
+
+        buffer = stream.buffer()
+        stream.submit(renderer.frame(i, out=buffer), buffer)
+    """
+
+    def __init__(self, size, fps, output_path, crf=RENDER_CRF, preset=RENDER_PRESET, threads=0,
+                 queue_size=STREAM_QUEUE_SIZE, hold_frames=None):
+        width, height = size
+        self.output_path = output_path
+        self._pending = queue.Queue(maxsize=queue_size)
+        # Un tampon par place de la file, plus celui en cours de composition et celui en cours d'écriture
+        self._free = queue.Queue()
+        for _ in range(queue_size + 2):
+            self._free.put(np.empty((height, width, 3), dtype=np.uint8))
+        self._error = None
+        self._process = subprocess.Popen(
+            _encoder_command(size, fps, output_path, crf, preset, threads, hold_frames),
+            stdin=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            frame, buffer = item
+            if self._error is None:
+                try:
+                    self._process.stdin.write(np.ascontiguousarray(frame).data)
+                except (BrokenPipeError, OSError) as e:
+                    # ffmpeg s'est arrêté : on continue de vider la file pour ne pas bloquer le producteur
+                    self._error = e
+            if buffer is not None:
+                self._free.put(buffer)
+
+    def buffer(self):
+        """Tampon uint8 libre (bloque tant que la file est pleine)."""
+        return self._free.get()
+
+    def submit(self, frame, buffer=None):
+        """Met l'image en file d'écriture ; `buffer` est recyclé une fois l'image écrite."""
+        self._pending.put((frame, buffer))
+
+    def close(self):
+        """Termine l'écriture et attend ffmpeg. Lève RuntimeError si l'encodage a échoué."""
+        self._pending.put(None)
+        self._writer.join()
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        stderr = self._process.stderr.read()
+        if self._process.wait() != 0 or self._error is not None:
+            detail = stderr.decode("utf-8", errors="replace")[-2000:] or self._error
+            raise RuntimeError(f"ffmpeg a échoué pour {self.output_path} : {detail}")
+        return self.output_path
+
+
+def _stream_frames(renderer, frame_range, stream):
+    for frame_index in range(*frame_range):
+        buffer = stream.buffer()
+        stream.submit(renderer.frame(frame_index, out=buffer), buffer)
+
+
+def render_segment(timeline, frame_range, output_path, crf=RENDER_CRF, preset=RENDER_PRESET, threads=1):
+    """Rend les images [début, fin) de la timeline dans un fichier MP4 (exécuté dans un processus du pool)."""
+    renderer = TimelineRenderer(timeline)
+    hold = renderer.hold_frame(frame_range)
+    if hold is not None:
+        # Partie fixe : une seule image envoyée, répétée par ffmpeg
+        stream = EncoderStream(renderer.size, renderer.fps, output_path, crf, preset, threads,
+                               hold_frames=frame_range[1] - frame_range[0])
+        stream.submit(hold)
+        return stream.close()
+    stream = EncoderStream(renderer.size, renderer.fps, output_path, crf, preset, threads)
+    try:
+        _stream_frames(renderer, frame_range, stream)
+    finally:
+        stream.close()
+    return output_path
+
+
+def render_timeline_stream(timeline, output_path, crf=RENDER_CRF, preset=RENDER_PRESET, threads=0):
+    """Rend la timeline en un seul flux d'images vers ffmpeg, à mémoire bornée (quelques images)."""
+    renderer = TimelineRenderer(timeline)
+    print(f"--- [LOG] Rendu en flux : {renderer.frame_count} images à {renderer.fps} fps ---")
+    stream = EncoderStream(renderer.size, renderer.fps, output_path, crf, preset, threads)
+    try:
+        _stream_frames(renderer, (0, renderer.frame_count), stream)
+    finally:
+        stream.close()
+    return output_path
+
+
+def concat_segments(segment_paths, output_path):
+    """Joint les segments avec le concat demuxer, en copie de flux (aucun réencodage)."""
+    list_path = f"{output_path}.segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        result = subprocess.run(
+            [get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+             "-i", list_path, "-c", "copy", "-movflags", "+faststart", output_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise RuntimeError(f"Concaténation ffmpeg échouée : {result.stderr.decode('utf-8', errors='replace')[-2000:]}")
+    return output_path
+
+
+def render_timeline_segments(timeline, output_path, workers=RENDER_WORKERS, crf=RENDER_CRF, preset=RENDER_PRESET):
+    """Rend la timeline par segments dans un pool de processus, puis les joint sans réencodage."""
+    segments = TimelineRenderer(timeline).segments()
+    workers = max(1, min(workers, len(segments)))
+    # Avec plusieurs processus, un thread x264 par segment évite de surcharger les cœurs
+    threads = 1 if workers > 1 else 0
+    print(f"--- [LOG] Rendu segmenté : {len(segments)} segments sur {workers} processus ---")
+
+    with tempfile.TemporaryDirectory(prefix="reel_segments_", dir=os.path.dirname(os.path.abspath(output_path))) as tmp_dir:
+        paths = [os.path.join(tmp_dir, f"segment_{i:03d}.mp4") for i in range(len(segments))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(render_segment, timeline, frame_range, path, crf, preset, threads)
+                for frame_range, path in zip(segments, paths)
+            ]
+            for future in futures:
+                future.result()
+        return concat_segments(paths, output_path)
+
+
+def render_variants(image_paths, variants, sources=None):
+    """
+    Rend toutes les variantes (VariantSpec) du même jeu d'images en une seule passe :
+    sources décodées et recadrées une fois, une image de chaque variante à tour de rôle,
+    un encodeur ffmpeg par variante (les encodeurs tournent en parallèle). Retourne les chemins produits.
+    """
+    sources = sources or SourceImages()
+    jobs = []
+    for spec in variants:
+        renderer = TimelineRenderer(spec.timeline(image_paths), sources)
+        stream = EncoderStream(renderer.size, renderer.fps, spec.output_path, spec.crf, spec.preset)
+        jobs.append((renderer, stream))
+        print(f"--- [LOG] Variante {os.path.basename(spec.output_path)} : {renderer.size[0]}x{renderer.size[1]}, "
+              f"{renderer.frame_count} images à {renderer.fps} fps ---")
+
+    errors = []
+    try:
+        for frame_index in range(max(renderer.frame_count for renderer, _ in jobs)):
+            for renderer, stream in jobs:
+                if frame_index < renderer.frame_count:
+                    buffer = stream.buffer()
+                    stream.submit(renderer.frame(frame_index, out=buffer), buffer)
+    finally:
+        for _, stream in jobs:
+            try:
+                stream.close()
+            except RuntimeError as e:
+                errors.append(str(e))
+    if errors:
+        raise RuntimeError(" | ".join(errors))
+    return [spec.output_path for spec in variants]
@@ -0,0 +1,126 @@
+"""
+Registre partagé des identifiants et clients Google (GCS, Gemini, Vertex AI).
+
+Chaque objet est créé à la première demande puis réutilisé pendant toute la vie du processus :
+la clé de service n'est décodée qu'une fois et les canaux TLS/gRPC ne sont pas recréés
+à chaque image, légende ou téléversement (modes batch et exécutions longues).
+Les bibliothèques Google sont importées à la demande : un script n'a besoin que des
+dépendances des clients qu'il utilise réellement.
+"""
+import os
+import json
+import base64
+import functools
+import threading
+
+GCS_SERVICE_ACCOUNT_KEY = os.getenv("GCS_SERVICE_ACCOUNT_KEY")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+GCP_PROJECT_ID = "media-auto-instagram"
+GCP_REGION = "us-central1"
+
+_registry_lock = threading.RLock()
+
+
+def _memoize(func):
+    """Mémoïse un constructeur par arguments ; la création est protégée par un verrou (threads)."""
+    instances = {}
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        if args in instances:
+            return instances[args]
+        with _registry_lock:
+            if args not in instances:
+                instances[args] = func(*args)
+            return instances[args]
+
+    wrapper.cache_clear = instances.clear
+    return wrapper
+
+
+# ==============================================================================
+# IDENTIFIANTS
+# ==============================================================================
+
+@_memoize
+def get_service_account_info():
+    """
+    Décode GCS_SERVICE_ACCOUNT_KEY (JSON encodé en Base64, ou JSON brut) en dictionnaire.
+    Retourne None si la clé n'est pas définie.
+    """
+    if not GCS_SERVICE_ACCOUNT_KEY:
+        return None
+    raw_key = GCS_SERVICE_ACCOUNT_KEY.strip()
+    key_json = raw_key if raw_key.startswith('{') else base64.b64decode(raw_key).decode('utf-8')
+    return json.loads(key_json)
+
+
+@_memoize
+def get_credentials():
+    """Identifiants du compte de service, ou None pour utiliser les identifiants par défaut (ADC)."""
+    info = get_service_account_info()
+    if info is None:
+        return None
+    from google.oauth2 import service_account
+    return service_account.Credentials.from_service_account_info(info)
+
+
+# ==============================================================================
+# GEMINI (google-genai)
+# ==============================================================================
+
+@_memoize
+def get_gemini_client(api_key=None):
+    from google import genai
+    return genai.Client(api_key=api_key or GEMINI_API_KEY)
+
+
+# ==============================================================================
+# VERTEX AI
+# ==============================================================================
+
+@_memoize
+def init_vertexai(project_id=GCP_PROJECT_ID, location=GCP_REGION):
+    import vertexai
+    vertexai.init(project=project_id, location=location, credentials=get_credentials())
+    return True
+
+
+@_memoize
+def get_vertex_generative_model(model_name, project_id=GCP_PROJECT_ID, location=GCP_REGION):
+    init_vertexai(project_id, location)
+    from vertexai.generative_models import GenerativeModel
+    return GenerativeModel(model_name)
+
+
+@_memoize
+def get_image_generation_model(model_name, project_id=GCP_PROJECT_ID, location=GCP_REGION):
+    init_vertexai(project_id, location)
+    from vertexai.preview.vision_models import ImageGenerationModel
+    return ImageGenerationModel.from_pretrained(model_name)
+
+
+@_memoize
+def get_prediction_client(location=GCP_REGION):
+    from google.cloud.aiplatform_v1beta1.services.prediction_service import PredictionServiceClient
+    client_options = {"api_endpoint": f"{location}-aiplatform.googleapis.com"}
+    return PredictionServiceClient(client_options=client_options, credentials=get_credentials())
+
+
+# ==============================================================================
+# GOOGLE CLOUD STORAGE
+# ==============================================================================
+
+@_memoize
+def get_storage_client():
+    from google.cloud import storage
+    info = get_service_account_info()
+    if info is None:
+        return storage.Client(project=GCP_PROJECT_ID)
+    return storage.Client.from_service_account_info(info)
+
+
+@_memoize
+def get_gcs_bucket(bucket_name):
+    return get_storage_client().bucket(bucket_name)
@@ -0,0 +1,127 @@
+"""
+Téléversements GCS adressés par contenu.
+
+Le nom d'un objet est dérivé de l'empreinte SHA-256 de ses octets (`{préfixe}_{sha256[:32]}{ext}`) :
+- un média déjà présent dans le bucket (image de secours, média repris d'un run précédent)
+  n'est pas recopié : une simple lecture de métadonnées suffit ;
+- deux exécutions parallèles ne peuvent plus écraser l'objet de l'autre (plus de nom basé sur
+  l'heure), et l'écriture est conditionnée à l'absence de l'objet (if_generation_match=0) ;
+- le contenu d'un nom ne change jamais : les objets portent un Cache-Control long et immuable.
+
+Un flux (MediaStream) est envoyé au fil de sa lecture vers un objet temporaire (GCS_TMP_PREFIX)
+tout en étant haché : le téléchargement et l'upload se recouvrent. Une fois l'empreinte connue,
+l'objet temporaire est recopié côté serveur (rewrite, sans retransfert) sous son nom définitif,
+sauf si ce nom existe déjà, puis supprimé dans tous les cas.
+"""
+import hashlib
+import uuid
+
+GCS_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Multiple de 256 Ko exigé par GCS
+GCS_TMP_PREFIX = "tmp/"  # Objets temporaires (prévoir une règle de cycle de vie pour les orphelins)
+GCS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CONTENT_HASH_LENGTH = 32
+
+
+class HashingReader:
+    """
+    Enveloppe un flux lisible : calcule le SHA-256 et la taille des octets lus.
+    Le dernier bloc lu est conservé pour que l'upload résumable puisse y revenir (seek)
+    après un échec de chunk, sans relire ni re-hacher le flux source.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._digest = hashlib.sha256()
+        self._position = 0
+        self._last_block = b""
+        self._last_start = 0
+        self.size = 0
+
+    def read(self, size=-1):
+        start = self._position
+        offset = start - self._last_start
+        end = len(self._last_block) if size is None or size < 0 else offset + size
+        # Relecture du dernier bloc après un seek arrière, complétée par la suite du flux
+        # (une lecture courte serait prise pour la fin du média par l'upload résumable)
+        block = self._last_block[offset:end]
+        if size is None or size < 0 or len(block) < size:
+            fresh = self._stream.read(-1 if size is None or size < 0 else size - len(block))
+            if fresh:
+                self._digest.update(fresh)
+                self.size += len(fresh)
+                block += fresh
+        self._position += len(block)
+        if self._position == self.size:
+            self._last_block, self._last_start = block, start
+        return block
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position, whence=0):
+        if whence != 0 or not self._last_start <= position <= self.size:
+            raise OSError("HashingReader : seek possible uniquement dans le dernier bloc lu")
+        self._position = position
+        return position
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def content_addressed_name(digest, prefix, extension):
+    return f"{prefix}_{digest[:CONTENT_HASH_LENGTH]}{extension}"
+
+
+def _upload_stream(bucket, stream, prefix, extension, content_type):
+    """Envoie le flux vers un objet temporaire, puis le recopie côté serveur sous son nom définitif."""
+    from google.api_core.exceptions import NotFound, PreconditionFailed
+
+    reader = HashingReader(stream)
+    tmp_blob = bucket.blob(f"{GCS_TMP_PREFIX}{prefix}_{uuid.uuid4().hex}{extension}")
+    tmp_blob.chunk_size = GCS_UPLOAD_CHUNK_SIZE
+    try:
+        tmp_blob.upload_from_file(reader, content_type=content_type, if_generation_match=0)
+
+        blob = bucket.blob(content_addressed_name(reader.hexdigest(), prefix, extension))
+        if blob.exists():
+            return blob, False
+
+        blob.cache_control = GCS_CACHE_CONTROL
+        blob.content_type = content_type
+        try:
+            token, _, _ = blob.rewrite(tmp_blob, if_generation_match=0)
+            while token is not None:
+                token, _, _ = blob.rewrite(tmp_blob, token=token, if_generation_match=0)
+        except PreconditionFailed:
+            # Même contenu téléversé en parallèle par un autre run : l'objet est déjà le bon
+            return blob, False
+        return blob, True
+    finally:
+        try:
+            tmp_blob.delete()
+        except NotFound:
+            pass
+        except Exception as e:
+            print(f"⚠️ Objet temporaire GCS non supprimé ({tmp_blob.name}) : {e}")
+
+
+def upload_content_addressed(bucket, data, prefix, extension, content_type):
+    """
+    Téléverse `data` (octets ou flux lisible) sous un nom dérivé de son contenu.
+    Retourne (blob, uploaded) : uploaded vaut False si l'objet existait déjà.
+    """
+    from google.api_core.exceptions import PreconditionFailed
+
+    if not isinstance(data, (bytes, bytearray)):
+        return _upload_stream(bucket, data, prefix, extension, content_type)
+
+    blob = bucket.blob(content_addressed_name(hashlib.sha256(data).hexdigest(), prefix, extension))
+    if blob.exists():
+        return blob, False
+
+    blob.cache_control = GCS_CACHE_CONTROL
+    try:
+        blob.upload_from_string(data, content_type=content_type, if_generation_match=0)
+    except PreconditionFailed:
+        return blob, False
+    return blob, True
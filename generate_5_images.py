@@ -1,16 +1,20 @@
 import os
 import datetime
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from vertexai.preview.vision_models import ImageGenerationModel
+
+from gcp_clients import get_vertex_generative_model, get_image_generation_model
+import llm_cache
+from imagen_batch import generate_scene_images
+
+# Les idées de scènes restent en cache 1 h : un retry réutilise les mêmes prompts,
+# une nouvelle session planifiée en obtient de nouveaux.
+SCENES_CACHE_TTL = 3600
 
 def get_creative_scenes(project_id, location, num_scenes=5):
     """Demande à Gemini d'imaginer des scènes. Log chaque étape."""
     print(f"--- [LOG] Initialisation de Gemini ({location}) ---")
-    vertexai.init(project=project_id, location=location)
     
     # Utilisation de Gemini 1.5 Flash pour la rapidité et l'inventivité
-    model = GenerativeModel("gemini-2.5-flash")
+    model = get_vertex_generative_model("gemini-2.5-flash", project_id, location)
     
     prompt_instruction = (
         f"Generate {num_scenes} ultra-detailed image prompts for a high-end Instagram account. "
@@ -23,8 +27,14 @@ def get_creative_scenes(project_id, location, num_scenes=5):
     
     print(f"--- [LOG] Envoi de la requête créative à Gemini ---")
     try:
-        response = model.generate_content(prompt_instruction)
-        prompts = [p.strip() for p in response.text.split('\n') if len(p.strip()) > 20]
+        response_text = llm_cache.cached_generate(
+            "gemini-2.5-flash",
+            prompt_instruction,
+            lambda: model.generate_content(prompt_instruction).text,
+            params={"num_scenes": num_scenes},
+            ttl=SCENES_CACHE_TTL
+        )
+        prompts = [p.strip() for p in response_text.split('\n') if len(p.strip()) > 20]
         
         print(f"--- [LOG] Gemini a généré {len(prompts)} prompts avec succès ---")
         for i, p in enumerate(prompts):
@@ -40,8 +50,7 @@ def generate_session(project_id, location, model_name="imagen-4.0-ultra-generate
     print(f"Heure : {datetime.datetime.now()}")
     
     try:
-        vertexai.init(project=project_id, location=location)
-        image_model = ImageGenerationModel.from_pretrained(model_name)
+        image_model = get_image_generation_model(model_name, project_id, location)
 
         # Création du dossier de session
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -58,36 +67,23 @@ def generate_session(project_id, location, model_name="imagen-4.0-ultra-generate
             print("--- [ERREUR] Aucune scène à générer. Arrêt. ---")
             return
 
-        success_count = 0
-        
-        # Boucle de génération
-        for i, scene_prompt in enumerate(scenes):
-            index = i + 1
-            print(f"\n--- [IMAGE {index}/5] Lancement ---")
-            
-            try:
-                # Ajout de contraintes esthétiques fixes pour la cohérence
-                final_prompt = f"{scene_prompt}, cinematic lighting, shot on 35mm lens, f/1.8, elegant atmosphere, highly detailed textures."
-                
-                response = image_model.generate_images(
-                    prompt=final_prompt,
-                    number_of_images=1,
-                    aspect_ratio="9:16",
-                    safety_filter_level="block_only_high",
-                    person_generation="allow_adult"
-                )
+        # Ajout de contraintes esthétiques fixes pour la cohérence
+        final_prompts = [
+            f"{scene_prompt}, cinematic lighting, shot on 35mm lens, f/1.8, elegant atmosphere, highly detailed textures."
+            for scene_prompt in scenes
+        ]
 
-                if response and response.images and len(response.images) > 0:
-                    filename = os.path.join(output_dir, f"scene_{index}.png")
-                    response.images[0].save(location=filename, include_generation_parameters=False)
-                    print(f"--- [SUCCÈS] Image {index} sauvegardée sous {filename} ---")
-                    success_count += 1
-                else:
-                    print(f"--- [WARNING] L'API n'a retourné aucune image pour la scène {index} (Filtre de sécurité probable) ---")
-            
-            except Exception as e:
-                print(f"--- [ERREUR] Erreur technique sur l'image {index} : {e} ---")
-                continue
+        # Génération parallèle : la session dure environ le temps de l'image la plus lente
+        image_paths = generate_scene_images(
+            image_model,
+            final_prompts,
+            output_dir,
+            save_kwargs={"include_generation_parameters": False},
+            aspect_ratio="9:16",
+            safety_filter_level="block_only_high",
+            person_generation="allow_adult"
+        )
+        success_count = sum(1 for path in image_paths if path)
 
         print(f"\n=== RÉSUMÉ DE SESSION ===")
         print(f"Images réussies : {success_count}/{len(scenes)}")
@@ -1,10 +1,10 @@
 import base64
 import os
 import datetime
-from google.cloud import aiplatform
-from google.cloud.aiplatform_v1beta1.services.prediction_service import PredictionServiceClient
 from google.cloud.aiplatform_v1beta1.types import Value 
 
+from gcp_clients import get_prediction_client
+
 def generate_image_with_vertex_ai(
     project_id: str,
     location: str,
@@ -15,9 +15,7 @@ def generate_image_with_vertex_ai(
     mime_type: str = "image/png"
 ):
     try:
-        aiplatform.init(project=project_id, location=location)
-        client_options = {"api_endpoint": f"{location}-aiplatform.googleapis.com"}
-        client = PredictionServiceClient(client_options=client_options)
+        client = get_prediction_client(location)
 
         # 1. Nettoyage du prompt (on retire les tags Midjourney pour éviter de confondre Imagen)
         clean_prompt = prompt.replace("--ar 9:16", "").replace("--v 5", "").strip()
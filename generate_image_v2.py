@@ -1,7 +1,6 @@
 import os
 import datetime
-import vertexai
-from vertexai.preview.vision_models import ImageGenerationModel
+from gcp_clients import get_image_generation_model
 
 def generate_image_locally(
     project_id: str,
@@ -11,10 +10,8 @@ def generate_image_locally(
     output_dir: str = "generated_images"
 ):
     try:
-        vertexai.init(project=project_id, location=location)
-        
         # Chargement du modèle Imagen (3.0 ou 4.0 selon model_name)
-        model = ImageGenerationModel.from_pretrained(model_name)
+        model = get_image_generation_model(model_name, project_id, location)
 
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
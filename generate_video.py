@@ -2,12 +2,22 @@ import os
 from moviepy import ImageClip, concatenate_videoclips
 import moviepy.video.fx as fx
 
+from reel_timeline import ReelTimeline
+from ffmpeg_render import render_timeline
+from frame_renderer import render_timeline_segments, render_timeline_stream
+from frame_cache import cached_frame
+
 # ==================== CONFIGURATION ====================
 SOURCE_DIR = "generated_images/session_20251230_000707"
 OUTPUT_FILENAME = "recap_video_2s_fixed.mp4"
 DISPLAY_DURATION = 2.0     # Temps d'affichage fixe
 TRANSITION_DURATION = 0.5  # Temps de fondu
 FPS = 60
+# "segments" (défaut) : parties fixes encodées depuis une seule image répétée, fondus rendus à pleine
+# cadence, segments en parallèle joints sans réencodage ; "ffmpeg" : filter graph natif ;
+# "stream" : images composées une à une et envoyées à ffmpeg, mémoire bornée ;
+# "moviepy" : rendu de référence image par image en Python
+RENDER_ENGINE = os.getenv("RENDER_ENGINE", "segments")
 # ======================================================
 
 def create_perfect_timing_video(folder_path, output_name):
@@ -26,13 +36,32 @@ def create_perfect_timing_video(folder_path, output_name):
     if not image_files:
         return
 
+    video_path = os.path.join(folder_path, output_name)
+
+    if RENDER_ENGINE in ("ffmpeg", "segments", "stream"):
+        try:
+            timeline = ReelTimeline.from_images(image_files, DISPLAY_DURATION, TRANSITION_DURATION, FPS)
+            if RENDER_ENGINE == "segments":
+                render_timeline_segments(timeline, video_path, crf=18, preset="medium")
+            elif RENDER_ENGINE == "stream":
+                render_timeline_stream(timeline, video_path, crf=18, preset="medium")
+            else:
+                render_timeline(timeline, video_path, crf=18, preset="medium")
+            print(f"\n=== SUCCÈS : 2 SECONDES PAR IMAGE ({RENDER_ENGINE}) ===")
+            print(f"✓ Vidéo générée : {video_path}")
+        except Exception as e:
+            print(f"--- [ERREUR] : {e} ---")
+        return
+
     try:
         clips = []
         # La durée totale d'un clip doit être le temps d'affichage + le fondu
         total_clip_duration = DISPLAY_DURATION + TRANSITION_DURATION
+        size = ReelTimeline.from_images(image_files, DISPLAY_DURATION).frame_size()
 
         for i, path in enumerate(image_files):
-            clip = ImageClip(path).with_duration(total_clip_duration)
+            # Image décodée une seule fois, puis relue depuis le cache disque (memory-map)
+            clip = ImageClip(cached_frame(path, size)).with_duration(total_clip_duration)
             
             # On applique le fondu au début de chaque clip sauf le premier
             if i > 0:
@@ -42,8 +71,6 @@ def create_perfect_timing_video(folder_path, output_name):
 
         # On concatène en chevauchant exactement de la durée de la transition
         video = concatenate_videoclips(clips, method="compose", padding=-TRANSITION_DURATION)
-        
-        video_path = os.path.join(folder_path, output_name)
 
         video.write_videofile(
             video_path,
@@ -2,11 +2,16 @@ import os
 import datetime
 
 # Import corrigé pour MoviePy v2+ (plus de .editor)
-from moviepy import ImageClip, concatenate_videoclips
+from moviepy import concatenate_videoclips
 
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from vertexai.preview.vision_models import ImageGenerationModel
+from gcp_clients import get_vertex_generative_model, get_image_generation_model
+import llm_cache
+from imagen_batch import generate_scene_images
+from reel_timeline import ReelTimeline
+from ffmpeg_render import render_timeline
+from frame_renderer import render_timeline_segments, render_timeline_stream
+from video_effects import ken_burns_clip
+from frame_cache import cached_image
 
 # ==================== CONFIGURATION ====================
 PROJECT_ID = "media-auto-instagram"
@@ -14,12 +19,19 @@ LOCATION = "us-central1"
 MODEL_NAME = "imagen-4.0-ultra-generate-001"  # ou imagen-3 si besoin
 NUM_SCENES = 5
 DURATION_PER_IMAGE = 2.0  # 10 secondes total
+SCENES_CACHE_TTL = 3600   # Cache des prompts Gemini (retries) ; les nouvelles sessions en obtiennent de nouveaux
+ZOOM_RATE = 0.04          # Zoom doux : échelle 1 + 0.04 * t
+ZOOM_EASING = "linear"    # linear, ease_in, ease_out, ease_in_out (rendu MoviePy)
+VIDEO_FPS = 30
+# "ffmpeg" : filter graph natif (rapide) ; "segments" : segments rendus en parallèle sur tous les cœurs
+# puis joints sans réencodage ; "stream" : images composées une à une et envoyées à ffmpeg, mémoire bornée ;
+# "moviepy" : rendu de référence image par image en Python
+RENDER_ENGINE = os.getenv("RENDER_ENGINE", "ffmpeg")
 # ======================================================
 
 def get_creative_scenes(project_id, location, num_scenes=NUM_SCENES):
     print("--- [LOG] Initialisation Gemini ---")
-    vertexai.init(project=project_id, location=location)
-    model = GenerativeModel("gemini-2.5-flash")
+    model = get_vertex_generative_model("gemini-2.5-flash", project_id, location)
 
     prompt_instruction = (
         f"Generate {num_scenes} ultra-detailed image prompts for a luxury 'Old Money' aesthetic Instagram reel. "
@@ -31,8 +43,14 @@ def get_creative_scenes(project_id, location, num_scenes=NUM_SCENES):
     )
 
     try:
-        response = model.generate_content(prompt_instruction)
-        prompts = [line.strip() for line in response.text.split('\n') if len(line.strip()) > 20]
+        response_text = llm_cache.cached_generate(
+            "gemini-2.5-flash",
+            prompt_instruction,
+            lambda: model.generate_content(prompt_instruction).text,
+            params={"num_scenes": num_scenes},
+            ttl=SCENES_CACHE_TTL
+        )
+        prompts = [line.strip() for line in response_text.split('\n') if len(line.strip()) > 20]
         print(f"--- [LOG] {len(prompts)} prompts générés ---")
         return prompts[:num_scenes]
     except Exception as e:
@@ -42,8 +60,7 @@ def get_creative_scenes(project_id, location, num_scenes=NUM_SCENES):
 def generate_images_and_video():
     print(f"\n=== DÉBUT SESSION - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n")
 
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    image_model = ImageGenerationModel.from_pretrained(MODEL_NAME)
+    image_model = get_image_generation_model(MODEL_NAME, PROJECT_ID, LOCATION)
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     session_folder = f"session_{timestamp}"
@@ -56,53 +73,40 @@ def generate_images_and_video():
         print("Aucun prompt → arrêt.")
         return
 
-    image_paths = []
-    for i, prompt in enumerate(scenes):
-        print(f"\n--- Génération image {i+1}/{NUM_SCENES} ---")
-        try:
-            final_prompt = f"{prompt}, cinematic 35mm film look, f/1.8, ultra detailed, luxury old money aesthetic"
-            response = image_model.generate_images(
-                prompt=final_prompt,
-                number_of_images=1,
-                aspect_ratio="9:16",
-                safety_filter_level="block_only_high",
-                person_generation="allow_adult"
-            )
-            if response.images:
-                path = os.path.join(output_dir, f"scene_{i+1}.png")
-                response.images[0].save(location=path)
-                print(f"✓ Image {i+1} sauvegardée")
-                image_paths.append(path)
-            else:
-                print(f"✗ Image {i+1} bloquée")
-        except Exception as e:
-            print(f"✗ Erreur image {i+1} : {e}")
+    final_prompts = [
+        f"{prompt}, cinematic 35mm film look, f/1.8, ultra detailed, luxury old money aesthetic"
+        for prompt in scenes
+    ]
+    # Génération parallèle ; les scènes restent dans l'ordre des prompts
+    image_paths = [
+        path for path in generate_scene_images(
+            image_model,
+            final_prompts,
+            output_dir,
+            aspect_ratio="9:16",
+            safety_filter_level="block_only_high",
+            person_generation="allow_adult"
+        )
+        if path
+    ]
 
     if not image_paths:
         print("Aucune image → pas de vidéo.")
         return
 
     print("\n--- Création vidéo Reel 10s ---")
+    video_path = os.path.join(output_dir, "old_money_reel_10s.mp4")
     try:
-        clips = []
-        for path in image_paths:
-            clip = ImageClip(path).set_duration(DURATION_PER_IMAGE)
-            clip = clip.resize(lambda t: 1 + 0.04 * t)  # Zoom doux
-            clips.append(clip)
-
-        video = concatenate_videoclips(clips, method="compose")
-        video_path = os.path.join(output_dir, "old_money_reel_10s.mp4")
-
-        video.write_videofile(
-            video_path,
-            fps=30,
-            codec="libx264",
-            audio=False,
-            preset="medium",
-            threads=4,
-            logger=None,
-            ffmpeg_params=["-crf", "23", "-pix_fmt", "yuv420p"]
-        )
+        if RENDER_ENGINE in ("ffmpeg", "segments", "stream"):
+            timeline = ReelTimeline.from_images(image_paths, DURATION_PER_IMAGE, fps=VIDEO_FPS, zoom_rate=ZOOM_RATE)
+            if RENDER_ENGINE == "segments":
+                render_timeline_segments(timeline, video_path, crf=23, preset="medium")
+            elif RENDER_ENGINE == "stream":
+                render_timeline_stream(timeline, video_path, crf=23, preset="medium")
+            else:
+                render_timeline(timeline, video_path, crf=23, preset="medium")
+        else:
+            render_with_moviepy(image_paths, video_path)
 
         print(f"\n=== SUCCÈS ===")
         print(f"✓ {len(image_paths)} images + vidéo créée : {video_path}")
@@ -113,5 +117,26 @@ def generate_images_and_video():
         import traceback
         traceback.print_exc()
 
+def render_with_moviepy(image_paths, video_path):
+    """Rendu de référence MoviePy (composition image par image en Python)."""
+    size = ReelTimeline.from_images(image_paths, DURATION_PER_IMAGE).frame_size()
+    # Zoom doux précalculé : image réduite une fois (cache disque), un seul resize de la zone visible par image
+    clips = [
+        ken_burns_clip(path, size, DURATION_PER_IMAGE, VIDEO_FPS, ZOOM_RATE, ZOOM_EASING, buffer=cached_image(path, size))
+        for path in image_paths
+    ]
+
+    video = concatenate_videoclips(clips, method="compose")
+    video.write_videofile(
+        video_path,
+        fps=VIDEO_FPS,
+        codec="libx264",
+        audio=False,
+        preset="medium",
+        threads=4,
+        logger=None,
+        ffmpeg_params=["-crf", "23", "-pix_fmt", "yuv420p"]
+    )
+
 if __name__ == "__main__":
     generate_images_and_video()
@@ -0,0 +1,48 @@
+import os
+import sys
+
+from reel_timeline import VariantSpec
+from frame_renderer import render_variants
+
+# ==================== CONFIGURATION ====================
+SOURCE_DIR = "generated_images/session_20251230_000707"
+# Déclinaisons rendues en une seule passe (images décodées et recadrées une seule fois)
+VARIANTS = [
+    {"name": "reel_9x16.mp4", "output_format": "reel", "display_duration": 2.0, "transition": 0.5, "fps": 30},
+    {"name": "feed_4x5.mp4", "output_format": "feed", "display_duration": 2.0, "transition": 0.5, "fps": 30},
+    {"name": "square_1x1.mp4", "output_format": "square", "display_duration": 1.5, "transition": 0.5, "fps": 30},
+]
+# ======================================================
+
+def generate_variants(folder_path):
+    if not os.path.exists(folder_path):
+        print(f"--- [ERREUR] Dossier introuvable : {folder_path} ---")
+        return []
+
+    valid_extensions = ('.png', '.jpg', '.jpeg')
+    image_files = [
+        os.path.join(folder_path, f) for f in sorted(os.listdir(folder_path))
+        if f.lower().endswith(valid_extensions)
+    ]
+    if not image_files:
+        print("--- [ERREUR] Aucune image trouvée. ---")
+        return []
+
+    specs = []
+    for variant in VARIANTS:
+        options = {k: v for k, v in variant.items() if k != "name"}
+        specs.append(VariantSpec(os.path.join(folder_path, variant["name"]), **options))
+
+    print(f"--- [LOG] {len(specs)} variantes à partir de {len(image_files)} images ---")
+    try:
+        outputs = render_variants(image_files, specs)
+    except Exception as e:
+        print(f"--- [ERREUR] : {e} ---")
+        return []
+    for path in outputs:
+        print(f"✓ Vidéo générée : {path}")
+    return outputs
+
+
+if __name__ == "__main__":
+    generate_variants(sys.argv[1] if len(sys.argv) > 1 else SOURCE_DIR)
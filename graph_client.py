@@ -0,0 +1,547 @@
+"""
+Client partagé pour l'API Graph de Meta (Instagram).
+
+- Une seule `requests.Session` par jeton : les connexions TLS vers graph.facebook.com sont
+  réutilisées (keep-alive, pool de connexions) pour les 3 à 40 requêtes d'une publication.
+- Timeouts sur chaque requête, retries automatiques des GET sur erreurs 5xx.
+- Décodage uniforme des erreurs Graph en GraphAPIError.
+- Cache persistant (avec TTL) de l'ID Instagram Business de chaque Page, invalidé dès que
+  Graph renvoie une erreur d'authentification ou de propriété ; résolution groupée de
+  plusieurs Pages en une seule requête batch.
+- Poller de statut des conteneurs : vérifications rapides au début (les images sont souvent
+  prêtes en moins d'une seconde), puis backoff exponentiel + jitter. Le délai maximal dépend du
+  type et de la taille du média, et plusieurs conteneurs peuvent être surveillés en même temps.
+- Regroupement des lectures : les vérifications de statut, résolutions d'ID et lectures
+  d'insights émises en même temps (threads différents ou plusieurs conteneurs) partent dans
+  une seule requête batch Graph (GRAPH_BATCH_MAX_SIZE sous-requêtes par appel HTTP).
+"""
+import os
+import json
+import time
+import random
+import mimetypes
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from media_cache import MEDIA_CACHE_DIR
+
+GRAPH_API_VERSION = "v19.0"
+# Surchargeable pour pointer vers un faux serveur Graph local (tests de bout en bout)
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", f"https://graph.facebook.com/{GRAPH_API_VERSION}")
+
+# Connexions HTTP
+GRAPH_TIMEOUT = (5, 30)  # (connexion, lecture) en secondes
+GRAPH_POOL_SIZE = 16
+GRAPH_GET_RETRIES = 2
+
+# Cache des IDs Instagram Business (la liaison Page -> compte IG ne change presque jamais)
+BUSINESS_ID_CACHE_FILE = os.path.join(MEDIA_CACHE_DIR, "instagram_business_ids.json")
+BUSINESS_ID_CACHE_TTL = 7 * 24 * 3600
+
+# Taille maximale d'une requête batch Graph
+GRAPH_BATCH_MAX_SIZE = 50
+# Fenêtre pendant laquelle les lectures concurrentes sont regroupées avant l'envoi du batch
+GRAPH_COALESCE_WINDOW = float(os.getenv("GRAPH_COALESCE_WINDOW", 0.02))
+
+# Carrousels : 2 à 10 éléments
+CAROUSEL_MIN_ITEMS = 2
+CAROUSEL_MAX_ITEMS = 10
+
+# Backoff du poller de statut (secondes)
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 15.0
+POLL_BACKOFF_FACTOR = 1.6
+POLL_JITTER = 0.2  # ±20 % sur chaque attente
+
+# Délai maximal d'attente par type de conteneur, augmenté selon la taille du média
+POLL_BASE_DEADLINES = {"IMAGE": 60, "CAROUSEL": 120, "REELS": 180, "VIDEO": 180, "STORIES": 180}
+POLL_SECONDS_PER_MB = 2.0
+POLL_MAX_DEADLINE = 900
+
+FINISHED_STATUSES = ("FINISHED", "PUBLISHED")
+FAILED_STATUSES = ("ERROR", "EXPIRED")
+
+# Codes d'erreur Graph temporaires (limites de débit, indisponibilité) : on peut réessayer
+TRANSIENT_ERROR_CODES = (1, 2, 4, 17, 32, 341, 613)
+# Jeton invalide/expiré, permission manquante, ou objet inaccessible pour ce jeton (code 100, sous-code 33)
+AUTH_ERROR_CODES = (10, 102, 190)
+
+
+class GraphAPIError(Exception):
+    """Erreur renvoyée par l'API Graph (ou réponse HTTP/JSON inexploitable)."""
+
+    def __init__(self, message, status_code=None, code=None, subcode=None, error_type=None, fbtrace_id=None, payload=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.code = code
+        self.subcode = subcode
+        self.error_type = error_type
+        self.fbtrace_id = fbtrace_id
+        self.payload = payload
+
+    @classmethod
+    def from_payload(cls, status_code, payload):
+        error = payload.get("error", {}) if isinstance(payload, dict) else {}
+        return cls(
+            error.get("message") or f"Réponse Graph inattendue (HTTP {status_code})",
+            status_code=status_code,
+            code=error.get("code"),
+            subcode=error.get("error_subcode"),
+            error_type=error.get("type"),
+            fbtrace_id=error.get("fbtrace_id"),
+            payload=payload,
+        )
+
+    @property
+    def is_auth_error(self):
+        """Erreur d'authentification ou de propriété : la liaison Page -> compte IG n'est plus fiable."""
+        code = self.code or 0
+        return code in AUTH_ERROR_CODES or 200 <= code <= 299 or (code == 100 and self.subcode == 33)
+
+    @property
+    def is_transient(self):
+        return self.code in TRANSIENT_ERROR_CODES or (self.status_code or 0) >= 500
+
+    def __str__(self):
+        details = ", ".join(
+            f"{name}={value}" for name, value in
+            (("HTTP", self.status_code), ("code", self.code), ("subcode", self.subcode), ("fbtrace_id", self.fbtrace_id))
+            if value is not None
+        )
+        return f"{self.message} ({details})" if details else self.message
+
+
+def _build_session():
+    session = requests.Session()
+    retry = Retry(
+        total=GRAPH_GET_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),  # Les POST (création/publication) ne sont jamais rejoués
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=GRAPH_POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _ReadCoalescer:
+    """
+    Regroupe les GET émis pendant GRAPH_COALESCE_WINDOW en une requête batch Graph.
+    `submit` retourne un Future (JSON de la sous-requête, ou GraphAPIError) ; un lot plein
+    (GRAPH_BATCH_MAX_SIZE) part immédiatement, sinon le lot part à la fin de la fenêtre.
+    """
+
+    def __init__(self, client, window=GRAPH_COALESCE_WINDOW):
+        self.client = client
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+
+    def submit(self, relative_url):
+        future = Future()
+        with self._lock:
+            self._pending.append((relative_url, future))
+            if len(self._pending) >= GRAPH_BATCH_MAX_SIZE:
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+                ready, self._pending = self._pending, []
+            else:
+                ready = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if ready:
+            self._dispatch(ready)
+        return future
+
+    def _flush(self):
+        with self._lock:
+            ready, self._pending = self._pending, []
+            self._timer = None
+        if ready:
+            self._dispatch(ready)
+
+    def _dispatch(self, ready):
+        urls = [relative_url for relative_url, _ in ready]
+        try:
+            if len(urls) == 1:
+                # Lecture isolée : un GET simple plutôt qu'un batch d'une seule sous-requête
+                try:
+                    results = [self.client.get(urls[0])]
+                except GraphAPIError as e:
+                    results = [e]
+            else:
+                results = self.client.batch(urls)
+        except Exception as e:
+            results = [e] * len(ready)
+        for (_, future), result in zip(ready, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def poll_deadline(media_type, size_bytes=None):
+    """Durée maximale d'attente (secondes) pour un conteneur de ce type et de cette taille."""
+    deadline = POLL_BASE_DEADLINES.get(media_type, POLL_BASE_DEADLINES["REELS"])
+    if size_bytes:
+        deadline += POLL_SECONDS_PER_MB * size_bytes / (1024 * 1024)
+    return min(deadline, POLL_MAX_DEADLINE)
+
+
+_business_id_cache_lock = threading.Lock()
+
+
+def _load_business_id_cache():
+    try:
+        with open(BUSINESS_ID_CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _update_business_id_cache(updates=None, removed=()):
+    """Ajoute/supprime des entrées {page_id: {"id": ..., "resolved_at": ...}} du cache disque."""
+    with _business_id_cache_lock:
+        cache = _load_business_id_cache()
+        cache.update(updates or {})
+        for page_id in removed:
+            cache.pop(page_id, None)
+        try:
+            os.makedirs(os.path.dirname(BUSINESS_ID_CACHE_FILE), exist_ok=True)
+            tmp_path = f"{BUSINESS_ID_CACHE_FILE}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, BUSINESS_ID_CACHE_FILE)
+        except OSError as e:
+            print(f"    Avertissement : impossible d'écrire le cache des IDs Instagram ({e}).")
+
+
+def get_cached_business_id(page_id, ttl=BUSINESS_ID_CACHE_TTL):
+    entry = _load_business_id_cache().get(str(page_id))
+    if entry and time.time() - entry.get("resolved_at", 0) < ttl:
+        return entry.get("id")
+    return None
+
+
+def invalidate_business_id(page_id):
+    print(f"    [Cache] ID Instagram de la Page {page_id} invalidé.")
+    _update_business_id_cache(removed=[str(page_id)])
+
+
+class GraphClient:
+    """Client Graph API à connexions persistantes, lié à un jeton d'accès."""
+
+    def __init__(self, access_token, base_url=GRAPH_BASE_URL, timeout=GRAPH_TIMEOUT, session=None):
+        self.access_token = access_token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or _build_session()
+        # Compte IG -> Page FB, pour invalider le cache si Graph refuse l'accès au compte
+        self._page_by_insta_id = {}
+        self._reads = _ReadCoalescer(self)
+
+    # --- Requêtes de base ---
+
+    def request(self, method, path, params=None, data=None):
+        """Effectue une requête Graph et retourne le JSON décodé, ou lève GraphAPIError."""
+        url = path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+        params = dict(params or {})
+        if data is None:
+            params["access_token"] = self.access_token
+        else:
+            data = {**data, "access_token": self.access_token}
+
+        try:
+            r = self.session.request(method, url, params=params, data=data, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise GraphAPIError(f"Erreur réseau vers l'API Graph : {e}") from e
+
+        try:
+            payload = r.json()
+        except ValueError:
+            payload = None
+        if r.status_code >= 400 or not isinstance(payload, (dict, list)) or (isinstance(payload, dict) and "error" in payload):
+            raise GraphAPIError.from_payload(r.status_code, payload)
+        return payload
+
+    def get(self, path, **params):
+        return self.request("GET", path, params=params)
+
+    def post(self, path, **data):
+        return self.request("POST", path, data=data)
+
+    def get_coalesced(self, relative_url):
+        """GET regroupé avec les lectures concurrentes dans une requête batch ; même contrat que get()."""
+        return self._reads.submit(relative_url).result()
+
+    def batch(self, relative_urls):
+        """
+        Exécute des GET en requêtes batch Graph (GRAPH_BATCH_MAX_SIZE par appel HTTP).
+        Retourne, dans l'ordre, le JSON de chaque sous-requête ou la GraphAPIError correspondante.
+        """
+        results = []
+        for start in range(0, len(relative_urls), GRAPH_BATCH_MAX_SIZE):
+            chunk = relative_urls[start:start + GRAPH_BATCH_MAX_SIZE]
+            batch = [{"method": "GET", "relative_url": url} for url in chunk]
+            responses = self.post("", batch=json.dumps(batch), include_headers="false")
+            for response in responses:
+                if not response:
+                    results.append(GraphAPIError("Sous-requête batch sans réponse (délai dépassé côté Graph)"))
+                    continue
+                try:
+                    body = json.loads(response.get("body") or "null")
+                except ValueError:
+                    body = None
+                status_code = response.get("code")
+                if status_code != 200 or not isinstance(body, dict) or "error" in body:
+                    results.append(GraphAPIError.from_payload(status_code, body))
+                else:
+                    results.append(body)
+        return results
+
+    # --- Comptes ---
+
+    def _handle_account_error(self, insta_id, error):
+        """
+        Invalide l'ID en cache de la Page liée si Graph refuse l'accès au compte Instagram.
+        Une erreur temporaire (5xx, limite de débit) conserve la liaison : une erreur
+        d'authentification ultérieure doit encore pouvoir invalider le cache.
+        """
+        if not error.is_auth_error:
+            return
+        page_id = self._page_by_insta_id.pop(insta_id, None)
+        if page_id:
+            invalidate_business_id(page_id)
+
+    def get_instagram_business_id(self, page_id, use_cache=True):
+        """
+        ID du compte Instagram Business lié à la Page Facebook (None si aucun compte lié).
+        Le résultat est mis en cache sur disque (BUSINESS_ID_CACHE_TTL).
+        """
+        return self.resolve_instagram_business_ids([page_id], use_cache)[page_id]
+
+    def resolve_instagram_business_ids(self, page_ids, use_cache=True):
+        """
+        Résout les IDs Instagram Business de plusieurs Pages : d'abord via le cache,
+        puis toutes les Pages restantes en une seule requête batch. Retourne {page_id: insta_id|None}.
+        Lève GraphAPIError si une Page ne peut pas être lue.
+        """
+        resolved = {}
+        for page_id in page_ids:
+            cached = get_cached_business_id(page_id) if use_cache else None
+            if cached:
+                resolved[page_id] = cached
+
+        missing = [page_id for page_id in dict.fromkeys(page_ids) if page_id not in resolved]
+        if len(missing) == 1:
+            # Une seule Page : regroupée avec les autres résolutions concurrentes éventuelles
+            try:
+                responses = [self.get_coalesced(f"{missing[0]}?fields=instagram_business_account")]
+            except GraphAPIError as e:
+                responses = [e]
+        elif missing:
+            responses = self.batch([f"{page_id}?fields=instagram_business_account" for page_id in missing])
+        else:
+            responses = []
+
+        updates, removed, first_error = {}, [], None
+        for page_id, response in zip(missing, responses):
+            if isinstance(response, GraphAPIError):
+                if response.is_auth_error:
+                    removed.append(str(page_id))
+                first_error = first_error or response
+                continue
+            account = response.get("instagram_business_account")
+            resolved[page_id] = account["id"] if account else None
+            if account:
+                updates[str(page_id)] = {"id": account["id"], "resolved_at": time.time()}
+        if updates or removed:
+            _update_business_id_cache(updates, removed)
+        if first_error:
+            raise first_error
+
+        for page_id, insta_id in resolved.items():
+            if insta_id:
+                self._page_by_insta_id[insta_id] = page_id
+        return resolved
+
+    # --- Conteneurs média ---
+
+    def create_media_container(self, insta_id, media_url=None, caption=None, media_type="IMAGE", **extra):
+        """Crée un conteneur média (IMAGE, REELS, VIDEO, CAROUSEL...) et retourne son ID."""
+        payload = {key: value for key, value in extra.items() if value is not None}
+        if media_type:
+            payload["media_type"] = media_type
+        if caption is not None:
+            payload["caption"] = caption
+        if media_url:
+            if media_type in ("REELS", "VIDEO", "STORIES") and not payload.get("image_url"):
+                payload["video_url"] = media_url
+            else:
+                payload["image_url"] = media_url
+        try:
+            data = self.post(f"{insta_id}/media", **payload)
+        except GraphAPIError as e:
+            self._handle_account_error(insta_id, e)
+            raise
+        if "id" not in data:
+            raise GraphAPIError.from_payload(200, data)
+        return data["id"]
+
+    def get_container_status(self, creation_id):
+        return self.get_coalesced(f"{creation_id}?fields=status_code,status")
+
+    def get_container_statuses(self, creation_ids):
+        """Statut de plusieurs conteneurs en un seul batch : {creation_id: JSON ou GraphAPIError}."""
+        futures = {creation_id: self._reads.submit(f"{creation_id}?fields=status_code,status") for creation_id in creation_ids}
+        statuses = {}
+        for creation_id, future in futures.items():
+            try:
+                statuses[creation_id] = future.result()
+            except GraphAPIError as e:
+                statuses[creation_id] = e
+        return statuses
+
+    def publish_container(self, insta_id, creation_id):
+        """Publie un conteneur prêt et retourne l'ID du média Instagram."""
+        try:
+            data = self.post(f"{insta_id}/media_publish", creation_id=creation_id)
+        except GraphAPIError as e:
+            self._handle_account_error(insta_id, e)
+            raise
+        if "id" not in data:
+            raise GraphAPIError.from_payload(200, data)
+        return data["id"]
+
+    def get_media_insights(self, media_id, metrics=("reach", "likes", "comments", "saved", "shares")):
+        """Insights d'un média publié : {métrique: valeur}. Les lectures concurrentes sont regroupées."""
+        data = self.get_coalesced(f"{media_id}/insights?metric={','.join(metrics)}")
+        return {
+            entry["name"]: (entry.get("values") or [{}])[0].get("value")
+            for entry in data.get("data", [])
+        }
+
+    def get_publishing_limit(self, insta_id):
+        """
+        Quota de publication du compte (fenêtre glissante de 24 h).
+        Retourne {"quota_total": int, "quota_duration": secondes, "quota_usage": int}.
+        """
+        data = self.get(f"{insta_id}/content_publishing_limit", fields="config,quota_usage")
+        entries = data.get("data") or [{}]
+        config = entries[0].get("config") or {}
+        return {
+            "quota_total": int(config.get("quota_total", 0)),
+            "quota_duration": int(config.get("quota_duration", 86400)),
+            "quota_usage": int(entries[0].get("quota_usage", 0)),
+        }
+
+    def wait_for_containers(self, creation_ids, media_type="IMAGE", size_bytes=None):
+        """
+        Attend que chaque conteneur soit prêt (FINISHED) ou en échec (ERROR/EXPIRED).
+        Tous les conteneurs en attente sont vérifiés à chaque tour dans une même requête batch,
+        puis l'attente croît de façon exponentielle jusqu'à POLL_MAX_DELAY. Retourne {creation_id: bool}.
+        """
+        results = {}
+        pending = list(dict.fromkeys(creation_ids))
+        deadline = time.monotonic() + poll_deadline(media_type, size_bytes)
+        delay = POLL_INITIAL_DELAY
+        check = 0
+
+        while pending:
+            check += 1
+            for creation_id, data in self.get_container_statuses(pending).items():
+                if isinstance(data, GraphAPIError):
+                    if data.is_transient or data.status_code is None:
+                        # Erreur réseau ou limite de débit : on retentera au prochain tour
+                        data = {"status_code": None, "error": str(data)}
+                    else:
+                        data = {"status_code": "ERROR", "status": str(data)}
+                status = data.get("status_code")
+                print(f"    [Vérification {check}] Conteneur {creation_id} : {status}")
+                if status in FINISHED_STATUSES:
+                    results[creation_id] = True
+                elif status in FAILED_STATUSES:
+                    print(f"    ❌ Erreur de traitement du conteneur {creation_id}. Détails: {data.get('status') or data}")
+                    results[creation_id] = False
+            pending = [creation_id for creation_id in pending if creation_id not in results]
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for creation_id in pending:
+                    print(f"    ❌ Délai d'attente dépassé pour le conteneur {creation_id}.")
+                    results[creation_id] = False
+                break
+
+            jitter = random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+            time.sleep(min(delay * jitter, remaining))
+            delay = min(delay * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY)
+
+        return results
+
+    def wait_for_container(self, creation_id, media_type="IMAGE", size_bytes=None):
+        """Version mono-conteneur de wait_for_containers : True si le conteneur est prêt à publier."""
+        return self.wait_for_containers([creation_id], media_type, size_bytes)[creation_id]
+
+    def publish_carousel(self, insta_id, media_urls, caption):
+        """
+        Publie un carrousel : tous les conteneurs enfants sont créés puis surveillés en parallèle,
+        avant la création et la publication du conteneur parent CAROUSEL.
+        La latence totale est proche du traitement d'un seul enfant. Retourne l'ID du média publié.
+        """
+        if not CAROUSEL_MIN_ITEMS <= len(media_urls) <= CAROUSEL_MAX_ITEMS:
+            raise ValueError(f"Un carrousel contient de {CAROUSEL_MIN_ITEMS} à {CAROUSEL_MAX_ITEMS} médias ({len(media_urls)} fournis).")
+
+        def is_video(url):
+            return (mimetypes.guess_type(url.split("?")[0])[0] or "").startswith("video/")
+
+        def create_child(url):
+            # Les images enfants n'ont pas de media_type ; les vidéos utilisent VIDEO
+            return self.create_media_container(
+                insta_id, url, media_type="VIDEO" if is_video(url) else None, is_carousel_item="true"
+            )
+
+        # 1. CONTENEURS ENFANTS (en parallèle, dans l'ordre des médias)
+        with ThreadPoolExecutor(max_workers=len(media_urls)) as pool:
+            child_ids = list(pool.map(create_child, media_urls))
+        print(f"✅ {len(child_ids)} conteneurs enfants créés : {', '.join(child_ids)}")
+
+        # 2. TRAITEMENT DES ENFANTS (surveillés ensemble)
+        children_media_type = "VIDEO" if any(is_video(url) for url in media_urls) else "IMAGE"
+        statuses = self.wait_for_containers(child_ids, children_media_type)
+        failed = [child_id for child_id in child_ids if not statuses.get(child_id)]
+        if failed:
+            raise GraphAPIError(f"Conteneurs enfants non traités par Instagram : {', '.join(failed)}")
+
+        # 3. CONTENEUR PARENT, puis publication
+        parent_id = self.create_media_container(insta_id, caption=caption, media_type="CAROUSEL", children=",".join(child_ids))
+        print(f"✅ Conteneur CAROUSEL créé avec ID: {parent_id}")
+        if not self.wait_for_container(parent_id, "CAROUSEL"):
+            raise GraphAPIError(f"Le conteneur carrousel {parent_id} n'a pas pu être traité par Instagram.")
+        return self.publish_container(insta_id, parent_id)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_graph_client(access_token, base_url=GRAPH_BASE_URL):
+    """Client partagé (une session HTTP par jeton et URL de base) pour toute la vie du processus."""
+    key = (access_token, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = GraphClient(access_token, base_url)
+        return _clients[key]
+
@@ -1,17 +1,15 @@
 import os
-import requests
 import json
-import time 
-from google import genai
 from google.genai.errors import APIError
 
+from gcp_clients import get_gemini_client
+from graph_client import GraphAPIError, get_graph_client
+
 # --- 1. Configuration et Clés (Secrets GitHub) ---
 PAGE_ID = os.getenv("FB_PAGE_ID")
 ACCESS_TOKEN = os.getenv("FB_ACCESS_TOKEN") 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") 
 
-GRAPH_BASE_URL = "https://graph.facebook.com/v18.0"
-
 # --- Liste des sujets pour votre média ---
 POST_TOPICS = [
     "La percée de l'IA dans l'analyse financière pour les PME.",
@@ -30,7 +28,7 @@ def generate_ai_content_and_caption(topic):
     
     # Générer la description (texte)
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = get_gemini_client()
         prompt = (
             f"Génère une légende de publication Instagram percutante et factuelle sur le sujet : '{topic}'. "
             "Le ton doit être visuel et inviter à l'action. "
@@ -52,48 +50,24 @@ def generate_ai_content_and_caption(topic):
 
 def get_instagram_business_id():
     """Récupère l'ID du compte Instagram Business lié à la Page Facebook."""
-    url = f"{GRAPH_BASE_URL}/{PAGE_ID}?fields=instagram_business_account&access_token={ACCESS_TOKEN}"
-    
     try:
-        r = requests.get(url)
-        r.raise_for_status()
-        data = r.json()
-        
-        if 'instagram_business_account' in data:
-            return data['instagram_business_account']['id']
-        else:
-            print("❌ Erreur: Compte Instagram Business non trouvé.")
-            return None
-    except requests.exceptions.HTTPError as e:
-        print(f"❌ Échec de la requête d'ID Instagram (HTTP): {e}")
+        insta_id = get_graph_client(ACCESS_TOKEN).get_instagram_business_id(PAGE_ID)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la requête d'ID Instagram : {e}")
         return None
+    
+    if not insta_id:
+        print("❌ Erreur: Compte Instagram Business non trouvé.")
+    return insta_id
 
 def check_media_status(creation_id, access_token):
-    """Vérifie l'état de traitement du conteneur."""
-    
-    status_url = f"{GRAPH_BASE_URL}/{creation_id}?fields=status_code&access_token={access_token}"
+    """Vérifie l'état de traitement du conteneur (poller adaptatif partagé)."""
     
-    max_checks = 6 
+    if get_graph_client(access_token).wait_for_container(creation_id, "IMAGE"):
+        print("   ✅ Image prête à être publiée.")
+        return True
     
-    for i in range(max_checks):
-        r = requests.get(status_url)
-        data = r.json()
-        
-        status = data.get('status_code')
-        
-        print(f"   [Vérification {i+1}/{max_checks}] Statut de l'image: {status}")
-        
-        if status == 'FINISHED':
-            print("   ✅ Image prête à être publiée.")
-            return True
-        
-        if status == 'ERROR':
-            print("   ❌ Erreur de traitement de l'image.")
-            return False
-            
-        time.sleep(5) 
-        
-    print(f"   ❌ Délai d'attente dépassé ({max_checks * 5} secondes). Annulation de la publication.")
+    print("   ❌ Image non traitée. Annulation de la publication.")
     return False
 
 
@@ -101,27 +75,17 @@ def publish_instagram_image(insta_id, image_url, caption):
     """Effectue la publication d'image en deux étapes sur Instagram."""
     
     print("\n--- Début de la publication d'image sur Instagram (Processus en 2 étapes) ---")
+    graph = get_graph_client(ACCESS_TOKEN)
     
     # 1. CRÉER LE CONTENEUR MÉDIA
     print("Étape 1/2: Création du conteneur média...")
-    media_container_url = f"{GRAPH_BASE_URL}/{insta_id}/media"
-    
-    container_payload = {
-        "media_type": "IMAGE",           
-        "image_url": image_url,          
-        "caption": caption,
-        "access_token": ACCESS_TOKEN
-    }
-    
-    r1 = requests.post(media_container_url, data=container_payload)
-    data1 = r1.json()
-    
-    if r1.status_code != 200 or 'id' not in data1:
-        print(f"❌ Échec de la création du conteneur. Statut: {r1.status_code}")
-        print("Erreur Meta (Conteneur Image):", json.dumps(data1, indent=4))
+    try:
+        creation_id = graph.create_media_container(insta_id, image_url, caption, "IMAGE")
+    except GraphAPIError as e:
+        print(f"❌ Échec de la création du conteneur. Statut: {e.status_code}")
+        print("Erreur Meta (Conteneur Image):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
         
-    creation_id = data1['id']
     print(f"✅ Conteneur image créé avec ID: {creation_id}")
     
     # VÉRIFICATION DE L'ÉTAT DU CONTENEUR
@@ -130,26 +94,18 @@ def publish_instagram_image(insta_id, image_url, caption):
     
     # 2. PUBLIER LE CONTENEUR MÉDIA
     print("\nÉtape 2/2: Publication du conteneur...")
-    publish_url = f"{GRAPH_BASE_URL}/{insta_id}/media_publish"
-    
-    publish_payload = {
-        "creation_id": creation_id,
-        "access_token": ACCESS_TOKEN
-    }
-    
-    r2 = requests.post(publish_url, data=publish_payload)
-    data2 = r2.json()
-    
-    if r2.status_code == 200 and 'id' in data2:
-        print("\n" + "="*50)
-        print("✅ PUBLICATION IMAGE INSTAGRAM DÉCLENCHÉE AVEC SUCCÈS !")
-        print("==================================================")
-        return True
-    else:
-        print(f"❌ Échec de la publication finale Instagram. Statut: {r2.status_code}")
-        print("Erreur Meta (Publication Image):", json.dumps(data2, indent=4))
+    try:
+        graph.publish_container(insta_id, creation_id)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la publication finale Instagram. Statut: {e.status_code}")
+        print("Erreur Meta (Publication Image):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
 
+    print("\n" + "="*50)
+    print("✅ PUBLICATION IMAGE INSTAGRAM DÉCLENCHÉE AVEC SUCCÈS !")
+    print("==================================================")
+    return True
+
 
 # --- 4. Main Execution ---
 
@@ -0,0 +1,47 @@
+"""
+Génération concurrente des scènes Imagen d'une session.
+
+Chaque appel Imagen 4 Ultra prend plusieurs secondes : les scènes sont lancées en parallèle
+(pool de threads borné par IMAGEN_MAX_WORKERS) et chaque image est écrite sur disque dès
+qu'elle est prête. Les fichiers restent nommés scene_1.png, scene_2.png... selon l'ordre des
+prompts, et le résultat est retourné dans ce même ordre.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+IMAGEN_MAX_WORKERS = int(os.getenv("IMAGEN_MAX_WORKERS", 5))
+
+
+def generate_scene_images(image_model, prompts, output_dir, max_workers=IMAGEN_MAX_WORKERS, save_kwargs=None, **generate_kwargs):
+    """
+    Génère une image par prompt avec `image_model.generate_images(prompt=..., **generate_kwargs)`.
+    Retourne la liste des chemins dans l'ordre des prompts (None pour une scène bloquée ou en erreur).
+    """
+    save_kwargs = save_kwargs or {}
+    total = len(prompts)
+
+    def render(index, prompt):
+        response = image_model.generate_images(prompt=prompt, number_of_images=1, **generate_kwargs)
+        if not response or not response.images:
+            return None
+        path = os.path.join(output_dir, f"scene_{index}.png")
+        response.images[0].save(location=path, **save_kwargs)
+        return path
+
+    paths = [None] * total
+    print(f"--- [LOG] Lancement de {total} scènes en parallèle (max {max_workers} simultanées) ---")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as pool:
+        futures = {pool.submit(render, i + 1, prompt): i for i, prompt in enumerate(prompts)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                paths[i] = future.result()
+            except Exception as e:
+                print(f"--- [ERREUR] Erreur technique sur l'image {i + 1}/{total} : {e} ---")
+                continue
+            if paths[i]:
+                print(f"--- [SUCCÈS] Image {i + 1}/{total} sauvegardée sous {paths[i]} ---")
+            else:
+                print(f"--- [WARNING] L'API n'a retourné aucune image pour la scène {i + 1} (Filtre de sécurité probable) ---")
+
+    return paths
@@ -1,18 +1,18 @@
 import os
-import requests
 import json
 import random 
-from google import genai
 from google.genai.errors import APIError
 
+from gcp_clients import get_gemini_client
+from graph_client import GraphAPIError, get_graph_client
+
 # --- 1. Récupération des Clés (Secrets GitHub) ---
 # NOTE: L'ID de la Page Facebook est utilisé pour trouver l'ID du compte Instagram.
 PAGE_ID = os.getenv("FB_PAGE_ID")
 ACCESS_TOKEN = os.getenv("FB_ACCESS_TOKEN") 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") 
 
-# L'API Instagram est gérée via l'API Graph de Meta (v18.0)
-GRAPH_BASE_URL = "https://graph.facebook.com/v18.0"
+# L'API Instagram est gérée via l'API Graph de Meta (client partagé, voir graph_client.py)
 
 # --- Liste des sujets pour votre média ---
 POST_TOPICS = [
@@ -33,7 +33,7 @@ def generate_ai_content_and_caption(topic):
     
     # 2. Générer la légende (texte)
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = get_gemini_client()
         prompt = (
             f"Génère une légende Instagram percutante et factuelle de 120 mots maximum sur le sujet : '{topic}'. "
             "Le ton doit être visuel et inviter à l'action. "
@@ -54,77 +54,51 @@ def generate_ai_content_and_caption(topic):
 def get_instagram_business_id():
     """Récupère l'ID du compte Instagram Business lié à la Page Facebook."""
     # Cet endpoint est utilisé pour trouver l'ID du compte Instagram lié à la Page FB.
-    url = f"{GRAPH_BASE_URL}/{PAGE_ID}?fields=instagram_business_account&access_token={ACCESS_TOKEN}"
-    
     try:
-        r = requests.get(url)
-        r.raise_for_status()
-        data = r.json()
-        
-        if 'instagram_business_account' in data:
-            insta_id = data['instagram_business_account']['id']
-            print(f"✅ ID Instagram Business trouvé: {insta_id}")
-            return insta_id
-        else:
-            print(f"❌ Erreur: Compte Instagram Business non trouvé ou non lié à la Page {PAGE_ID}.")
-            print("Vérifiez la liaison de la Page Facebook à Instagram.")
-            print("Réponse Meta:", json.dumps(data, indent=4))
-            return None
-    except requests.exceptions.HTTPError as e:
-        print(f"❌ Échec de la requête d'ID Instagram (HTTP): {e}")
+        insta_id = get_graph_client(ACCESS_TOKEN).get_instagram_business_id(PAGE_ID)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la requête d'ID Instagram : {e}")
         return None
+    
+    if insta_id:
+        print(f"✅ ID Instagram Business trouvé: {insta_id}")
+        return insta_id
+    
+    print(f"❌ Erreur: Compte Instagram Business non trouvé ou non lié à la Page {PAGE_ID}.")
+    print("Vérifiez la liaison de la Page Facebook à Instagram.")
+    return None
 
 def publish_instagram_media(insta_id, image_url, caption):
     """Effectue la publication en deux étapes sur Instagram."""
+    graph = get_graph_client(ACCESS_TOKEN)
     
     # 1. CRÉER LE CONTENEUR MÉDIA (Content Publishing Container)
     print("Étape 1/2: Création du conteneur média...")
-    
-    media_container_url = f"{GRAPH_BASE_URL}/{insta_id}/media"
-    
-    container_payload = {
-        "image_url": image_url,
-        "caption": caption,
-        "access_token": ACCESS_TOKEN
-    }
-    
-    r1 = requests.post(media_container_url, data=container_payload)
-    data1 = r1.json()
-    
-    if r1.status_code != 200 or 'id' not in data1:
-        print(f"❌ Échec de la création du conteneur. Statut: {r1.status_code}")
-        print("Erreur Meta (Conteneur):", json.dumps(data1, indent=4))
+    try:
+        creation_id = graph.create_media_container(insta_id, image_url, caption, media_type=None)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la création du conteneur. Statut: {e.status_code}")
+        print("Erreur Meta (Conteneur):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
         
-    creation_id = data1['id']
     print(f"✅ Conteneur créé avec ID: {creation_id}")
     
     # 2. PUBLIER LE CONTENEUR MÉDIA
     print("Étape 2/2: Publication du conteneur...")
-    
-    publish_url = f"{GRAPH_BASE_URL}/{insta_id}/media_publish"
-    
-    publish_payload = {
-        "creation_id": creation_id,
-        "access_token": ACCESS_TOKEN
-    }
-    
-    r2 = requests.post(publish_url, data=publish_payload)
-    data2 = r2.json()
-    
-    if r2.status_code == 200 and 'id' in data2:
-        post_id = data2['id']
-        print("\n" + "="*50)
-        print("✅ PUBLICATION INSTAGRAM AUTONOME RÉUSSIE !")
-        print(f"ID du Post Instagram: {post_id}")
-        print("Vérifiez le compte @media_france.")
-        print("==================================================")
-        return True
-    else:
-        print(f"❌ Échec de la publication finale. Statut: {r2.status_code}")
-        print("Erreur Meta (Publication):", json.dumps(data2, indent=4))
+    try:
+        post_id = graph.publish_container(insta_id, creation_id)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la publication finale. Statut: {e.status_code}")
+        print("Erreur Meta (Publication):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
 
+    print("\n" + "="*50)
+    print("✅ PUBLICATION INSTAGRAM AUTONOME RÉUSSIE !")
+    print(f"ID du Post Instagram: {post_id}")
+    print("Vérifiez le compte @media_france.")
+    print("==================================================")
+    return True
+
 
 if __name__ == "__main__":
     if not all([PAGE_ID, ACCESS_TOKEN, GEMINI_API_KEY]):
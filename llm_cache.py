@@ -0,0 +1,86 @@
+"""
+Cache disque des réponses LLM (Gemini), adressé par contenu.
+
+La clé d'une réponse est l'empreinte SHA-256 de (modèle, prompt, paramètres) : un retry,
+une relance du workflow ou un rendu A/B avec le même prompt relit la réponse sur disque
+au lieu de refaire un appel payant.
+- TTL : une entrée plus vieille que `ttl` secondes est ignorée puis régénérée.
+- LRU borné : au-delà de LLM_CACHE_MAX_ENTRIES fichiers, les moins récemment lus sont supprimés.
+- Contournement : LLM_CACHE_BYPASS=1 (ou bypass=True) force un appel au modèle.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+from media_cache import MEDIA_CACHE_DIR, evict_lru, touch
+
+LLM_CACHE_DIR = os.path.join(MEDIA_CACHE_DIR, "llm")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 500))
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+def cache_key(model, prompt, params=None):
+    payload = json.dumps({"model": model, "prompt": prompt, "params": params or {}}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(LLM_CACHE_DIR, f"{key}.json")
+
+
+def get_cached_response(key, ttl=None):
+    """Retourne le texte en cache pour `key`, ou None (absent, expiré ou illisible)."""
+    ttl = LLM_CACHE_TTL if ttl is None else ttl
+    path = _entry_path(key)
+    try:
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if time.time() - entry.get('created_at', 0) > ttl:
+        return None
+
+    touch(path)
+    return entry.get('text')
+
+
+def store_response(key, model, text):
+    os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+    path = _entry_path(key)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"model": model, "created_at": time.time(), "text": text}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    _evict()
+
+
+def _evict(max_entries=None):
+    """Supprime les entrées les moins récemment utilisées au-delà de max_entries."""
+    evict_lru(LLM_CACHE_DIR, '.json', max_entries=LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries)
+
+
+def cached_generate(model, prompt, generate, params=None, ttl=None, bypass=None):
+    """
+    Retourne la réponse de `generate()` (callable sans argument renvoyant le texte du modèle),
+    en passant par le cache disque. Les réponses vides ne sont pas mises en cache.
+    """
+    if LLM_CACHE_BYPASS if bypass is None else bypass:
+        return generate()
+
+    key = cache_key(model, prompt, params)
+    text = get_cached_response(key, ttl)
+    if text is not None:
+        print(f"    [Cache LLM] Réponse {model} réutilisée ({key[:12]})")
+        return text
+
+    text = generate()
+    if text:
+        try:
+            store_response(key, model, text)
+        except OSError as e:
+            print(f"    Avertissement : impossible d'écrire le cache LLM ({e}).")
+    return text
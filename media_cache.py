@@ -0,0 +1,57 @@
+"""
+Emplacement et éviction des caches disque locaux.
+
+Tous les caches (réponses LLM, images recadrées, flux RSS, index des articles publiés,
+IDs Instagram, file de publication) vivent sous MEDIA_CACHE_DIR. Les caches bornés
+(llm_cache, frame_cache) partagent la même politique LRU : la date de modification d'une
+entrée sert d'horodatage « dernier accès » (`touch` à chaque lecture), et `evict_lru`
+supprime les entrées les plus anciennes au-delà d'un nombre de fichiers ou d'une taille totale.
+"""
+import os
+import threading
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", ".cache")
+
+_eviction_lock = threading.Lock()
+
+
+def touch(path):
+    """Marque l'entrée comme lue (ordre LRU) ; une entrée disparue entre-temps est ignorée."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_lru(directory, suffix, max_entries=None, max_bytes=None, keep=None):
+    """
+    Supprime les fichiers `*suffix` de `directory` les moins récemment utilisés, jusqu'à revenir
+    sous max_entries fichiers et/ou max_bytes octets. `keep` (entrée tout juste écrite) n'est jamais supprimée.
+    """
+    with _eviction_lock:
+        try:
+            entries = [
+                (entry, entry.stat()) for entry in os.scandir(directory)
+                if entry.name.endswith(suffix) and entry.path != keep
+            ]
+        except FileNotFoundError:
+            return
+        count = len(entries)
+        total = sum(st.st_size for _, st in entries)
+
+        def over_limit():
+            return (max_entries is not None and count > max_entries) or (max_bytes is not None and total > max_bytes)
+
+        if not over_limit():
+            return
+        entries.sort(key=lambda item: item[1].st_mtime)
+        for entry, st in entries:
+            if not over_limit():
+                break
+            try:
+                # Un fichier encore ouvert (ou mappé) reste lisible par ses lecteurs après suppression
+                os.remove(entry.path)
+                count -= 1
+                total -= st.st_size
+            except OSError:
+                pass
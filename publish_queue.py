@@ -0,0 +1,411 @@
+"""
+File d'attente persistante des publications Instagram (SQLite).
+
+Chaque job décrit « publier ce média + cette légende sur ce compte ». Les scripts de génération
+mettent les jobs en file (`enqueue`) ; un pool de workers les vide (`work`) :
+- Idempotence : une clé unique par job (par défaut, empreinte compte + URL + légende + type) ;
+  remettre le même média en file ne crée pas de doublon.
+- Reprise : un échec transitoire replanifie le job avec un backoff exponentiel, jusqu'à
+  PUBLISH_QUEUE_MAX_ATTEMPTS tentatives. L'ID du conteneur déjà créé est conservé et réutilisé :
+  un retry ne recrée pas de conteneur et ne republie pas un média déjà publié. Un conteneur
+  refusé par Instagram (ERROR/EXPIRED) fait échouer le job définitivement.
+- Quota : un seau à jetons par compte est initialisé depuis `content_publishing_limit`
+  (quota_total - quota_usage sur la fenêtre glissante). Un worker prend un jeton avant de
+  réserver un job, et le rend si le job n'arrive pas jusqu'à la publication : quand le seau
+  est vide, les jobs restent en attente sans conteneur créé ni appel Graph consommé. Un refus
+  pour quota atteint replanifie le job à la fenêtre suivante sans compter de tentative.
+
+Usage :
+    python publish_queue.py enqueue --media-url URL --caption "..." [--media-type REELS]
+    python publish_queue.py work [--workers 2] [--wait]
+    python publish_queue.py status
+
+GRAPH_BASE_URL permet de pointer vers un faux serveur Graph local pour tester de bout en bout.
+"""
+import os
+import sys
+import time
+import json
+import random
+import sqlite3
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from graph_client import FAILED_STATUSES, GRAPH_BASE_URL, GraphAPIError, get_graph_client
+from media_cache import MEDIA_CACHE_DIR
+
+# --- Configuration ---
+PAGE_ID = os.getenv("FB_PAGE_ID")
+ACCESS_TOKEN = os.getenv("FB_ACCESS_TOKEN")
+
+PUBLISH_QUEUE_DB = os.getenv("PUBLISH_QUEUE_DB", os.path.join(MEDIA_CACHE_DIR, "publish_queue.db"))
+PUBLISH_QUEUE_WORKERS = int(os.getenv("PUBLISH_QUEUE_WORKERS", 2))
+PUBLISH_QUEUE_MAX_ATTEMPTS = int(os.getenv("PUBLISH_QUEUE_MAX_ATTEMPTS", 5))
+RETRY_BASE_DELAY = 30        # secondes, doublé à chaque tentative
+RETRY_MAX_DELAY = 3600
+# Un job resté "processing" plus longtemps que ce délai vient d'un worker interrompu
+PROCESSING_LEASE = 30 * 60
+
+# Limite de publication atteinte (code 9 / sous-code 2207042) : inutile de réessayer avant la fenêtre suivante
+PUBLISH_LIMIT_ERROR_CODES = (9,)
+PUBLISH_LIMIT_ERROR_SUBCODES = (2207042,)
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_PUBLISHED = "published"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    insta_id TEXT NOT NULL,
+    media_url TEXT NOT NULL,
+    caption TEXT,
+    media_type TEXT NOT NULL DEFAULT 'IMAGE',
+    size_bytes INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    creation_id TEXT,
+    media_id TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, next_attempt_at);
+"""
+
+
+# ==============================================================================
+# 1. STOCKAGE SQLITE
+# ==============================================================================
+
+def connect(db_path=PUBLISH_QUEUE_DB):
+    """Connexion SQLite (une par thread), schéma créé au besoin."""
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def make_idempotency_key(insta_id, media_url, caption, media_type):
+    payload = json.dumps([insta_id, media_url, caption, media_type], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def enqueue(conn, insta_id, media_url, caption, media_type="IMAGE", size_bytes=None, idempotency_key=None):
+    """
+    Ajoute un job de publication. Retourne (job_id, created) : si un job porte déjà la même
+    clé d'idempotence, c'est son ID qui est retourné et created vaut False.
+    """
+    key = idempotency_key or make_idempotency_key(insta_id, media_url, caption, media_type)
+    now = time.time()
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO jobs (idempotency_key, insta_id, media_url, caption, media_type, size_bytes, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (key, insta_id, media_url, caption, media_type, size_bytes, now, now),
+    )
+    if cursor.rowcount:
+        return cursor.lastrowid, True
+    row = conn.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+    return row["id"], False
+
+
+def claim_next_job(conn, insta_id=None):
+    """Réserve atomiquement le prochain job prêt (pending et dont l'heure de reprise est passée)."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        query = "SELECT * FROM jobs WHERE status = ? AND next_attempt_at <= ?"
+        params = [STATUS_PENDING, now]
+        if insta_id:
+            query += " AND insta_id = ?"
+            params.append(insta_id)
+        row = conn.execute(query + " ORDER BY next_attempt_at, id LIMIT 1", params).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (STATUS_PROCESSING, now, row["id"]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if row is None:
+        return None
+    job = dict(row)
+    job["attempts"] += 1
+    return job
+
+
+def update_job(conn, job_id, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def release_stale_jobs(conn, lease=PROCESSING_LEASE):
+    """Remet en attente les jobs réservés par un worker interrompu (leur creation_id est conservé)."""
+    cursor = conn.execute(
+        "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+        (STATUS_PENDING, time.time(), STATUS_PROCESSING, time.time() - lease),
+    )
+    return cursor.rowcount
+
+
+def next_retry_at(conn):
+    """Heure (epoch) du prochain job en attente, ou None si la file est vide."""
+    row = conn.execute("SELECT MIN(next_attempt_at) AS t FROM jobs WHERE status = ?", (STATUS_PENDING,)).fetchone()
+    return row["t"]
+
+
+def queue_stats(conn):
+    return {row["status"]: row["n"] for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+
+# ==============================================================================
+# 2. LIMITEUR DE QUOTA (SEAU À JETONS)
+# ==============================================================================
+
+class PublishRateLimiter:
+    """
+    Seau à jetons d'un compte Instagram : capacité = quota_total, remplissage continu de
+    quota_total jetons par quota_duration secondes, niveau initial = quota restant annoncé par Graph.
+    """
+
+    def __init__(self, capacity, refill_period, tokens=None):
+        self.capacity = max(0, capacity)
+        self.refill_rate = self.capacity / refill_period if refill_period else 0
+        self.tokens = float(self.capacity if tokens is None else min(tokens, self.capacity))
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_graph(cls, graph, insta_id):
+        limit = graph.get_publishing_limit(insta_id)
+        remaining = limit["quota_total"] - limit["quota_usage"]
+        print(f"📊 Quota de publication : {limit['quota_usage']}/{limit['quota_total']} utilisés sur {limit['quota_duration'] // 3600} h.")
+        return cls(limit["quota_total"], limit["quota_duration"], max(0, remaining))
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Consomme un jeton si disponible ; ne bloque jamais (la fenêtre se compte en heures)."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def release(self):
+        """Rend un jeton consommé pour une publication qui n'a finalement pas été tentée."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def exhaust(self):
+        """Meta a refusé pour quota atteint : le seau est vidé, quoi qu'en dise le compteur local."""
+        with self._lock:
+            self.tokens = 0
+            self._updated = time.monotonic()
+
+    def seconds_until_token(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                return 0
+            return (1 - self.tokens) / self.refill_rate if self.refill_rate else float("inf")
+
+
+# ==============================================================================
+# 3. WORKERS
+# ==============================================================================
+
+def _retry_delay(attempts):
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _is_publish_limit_error(error):
+    return error.code in PUBLISH_LIMIT_ERROR_CODES or error.subcode in PUBLISH_LIMIT_ERROR_SUBCODES
+
+
+def process_job(conn, graph, job, limiter):
+    """
+    Exécute un job réservé : conteneur (créé ou réutilisé), attente du traitement, publication.
+    Le jeton de quota pris à la réservation est rendu si la publication n'est pas tentée.
+    Retourne le nouveau statut du job.
+    """
+    label = f"Job {job['id']} ({job['media_type']})"
+    publish_attempted = False
+    try:
+        creation_id = job["creation_id"]
+        if creation_id:
+            status = graph.get_container_status(creation_id).get("status_code")
+            if status == "PUBLISHED":
+                # Publié lors d'une tentative précédente interrompue avant l'écriture en base
+                print(f"✅ {label} : conteneur {creation_id} déjà publié.")
+                update_job(conn, job["id"], status=STATUS_PUBLISHED, last_error=None)
+                return STATUS_PUBLISHED
+            if status in FAILED_STATUSES:
+                print(f"    {label} : conteneur {creation_id} {status}, recréation.")
+                creation_id = None
+
+        if not creation_id:
+            creation_id = graph.create_media_container(job["insta_id"], job["media_url"], job["caption"], job["media_type"])
+            update_job(conn, job["id"], creation_id=creation_id)
+            print(f"✅ {label} : conteneur créé avec ID {creation_id}")
+
+        if not graph.wait_for_container(creation_id, job["media_type"], job["size_bytes"]):
+            # Média refusé par Instagram : un nouvel essai échouerait de la même façon
+            error = f"Le conteneur {creation_id} n'a pas pu être traité par Instagram."
+            print(f"❌ {label} abandonné : {error}")
+            update_job(conn, job["id"], status=STATUS_FAILED, last_error=error)
+            return STATUS_FAILED
+
+        publish_attempted = True
+        try:
+            media_id = graph.publish_container(job["insta_id"], creation_id)
+        except GraphAPIError as e:
+            if _is_publish_limit_error(e):
+                limiter.exhaust()
+            elif e.is_transient or e.status_code is None:
+                # Refus côté serveur ou réseau : la publication n'a pas été comptée par Meta
+                limiter.release()
+            raise
+        update_job(conn, job["id"], status=STATUS_PUBLISHED, media_id=media_id, last_error=None)
+        print(f"✅ {label} publié : {media_id}")
+        return STATUS_PUBLISHED
+
+    except GraphAPIError as e:
+        if _is_publish_limit_error(e):
+            # Quota atteint : le job attend la fenêtre suivante, la tentative n'est pas comptée
+            delay = limiter.seconds_until_token()
+            print(f"⏳ {label} : quota de publication atteint — nouvel essai dans {delay:.0f} s.")
+            update_job(conn, job["id"], status=STATUS_PENDING, attempts=job["attempts"] - 1,
+                       next_attempt_at=time.time() + delay, last_error=str(e))
+            return STATUS_PENDING
+        if (e.is_transient or e.status_code is None) and job["attempts"] < PUBLISH_QUEUE_MAX_ATTEMPTS:
+            delay = _retry_delay(job["attempts"])
+            print(f"⚠️ {label} : {e} — nouvel essai dans {int(delay)} s ({job['attempts']}/{PUBLISH_QUEUE_MAX_ATTEMPTS}).")
+            update_job(conn, job["id"], status=STATUS_PENDING, next_attempt_at=time.time() + delay, last_error=str(e))
+            return STATUS_PENDING
+        print(f"❌ {label} abandonné : {e}")
+        update_job(conn, job["id"], status=STATUS_FAILED, last_error=str(e))
+        return STATUS_FAILED
+
+    finally:
+        if not publish_attempted:
+            limiter.release()
+
+
+def run_workers(insta_id, access_token, workers=PUBLISH_QUEUE_WORKERS, db_path=PUBLISH_QUEUE_DB, wait=False, limiter=None,
+                base_url=GRAPH_BASE_URL):
+    """
+    Vide la file des jobs du compte avec un pool de workers. Sans `wait`, s'arrête dès qu'aucun
+    job n'est prêt (exécution cron) ; avec `wait`, attend les reprises planifiées tant que le quota le permet.
+    Retourne le nombre de jobs traités pendant l'exécution, par statut final.
+    """
+    graph = get_graph_client(access_token, base_url)
+    conn = connect(db_path)
+    released = release_stale_jobs(conn)
+    if released:
+        print(f"    {released} job(s) interrompu(s) remis en attente.")
+    limiter = limiter or PublishRateLimiter.from_graph(graph, insta_id)
+    outcomes = Counter()
+    outcomes_lock = threading.Lock()
+
+    def worker(index):
+        worker_conn = connect(db_path)
+        try:
+            while True:
+                # Jeton pris avant la réservation : sans quota, aucun conteneur n'est créé
+                if not limiter.try_acquire():
+                    return
+                job = claim_next_job(worker_conn, insta_id)
+                if job is None:
+                    limiter.release()
+                    retry_at = next_retry_at(worker_conn)
+                    if not wait or retry_at is None:
+                        return
+                    time.sleep(min(max(retry_at - time.time(), 0.1), RETRY_MAX_DELAY))
+                    continue
+                status = process_job(worker_conn, graph, job, limiter)
+                with outcomes_lock:
+                    outcomes[status] += 1
+        finally:
+            worker_conn.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(worker, range(workers)))
+
+    conn.close()
+    return dict(outcomes)
+
+
+# ==============================================================================
+# 4. LIGNE DE COMMANDE
+# ==============================================================================
+
+def resolve_insta_id(args):
+    if args.ig_id:
+        return args.ig_id
+    insta_id = get_graph_client(ACCESS_TOKEN).get_instagram_business_id(PAGE_ID)
+    if not insta_id:
+        print("❌ Erreur: Compte Instagram Business non trouvé.")
+        sys.exit(1)
+    return insta_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="File d'attente persistante des publications Instagram.")
+    parser.add_argument("--db", default=PUBLISH_QUEUE_DB, help="Fichier SQLite de la file")
+    parser.add_argument("--ig-id", help="ID du compte Instagram (défaut : résolu depuis FB_PAGE_ID)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Ajoute un job de publication")
+    enqueue_parser.add_argument("--media-url", required=True)
+    enqueue_parser.add_argument("--caption", default="")
+    enqueue_parser.add_argument("--media-type", default="IMAGE", choices=["IMAGE", "REELS", "VIDEO", "STORIES"])
+    enqueue_parser.add_argument("--size-bytes", type=int)
+    enqueue_parser.add_argument("--key", help="Clé d'idempotence (défaut : empreinte du job)")
+
+    work_parser = commands.add_parser("work", help="Vide la file avec un pool de workers")
+    work_parser.add_argument("--workers", type=int, default=PUBLISH_QUEUE_WORKERS)
+    work_parser.add_argument("--wait", action="store_true", help="Attend les reprises planifiées au lieu de s'arrêter")
+
+    commands.add_parser("status", help="Affiche l'état de la file")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(queue_stats(connect(args.db)), indent=4))
+        sys.exit(0)
+
+    if not ACCESS_TOKEN or not (args.ig_id or PAGE_ID):
+        print("Erreur : Les Secrets GitHub ne sont pas définis (FB_ACCESS_TOKEN et FB_PAGE_ID requis).")
+        sys.exit(1)
+
+    try:
+        insta_id = resolve_insta_id(args)
+        if args.command == "enqueue":
+            job_id, created = enqueue(connect(args.db), insta_id, args.media_url, args.caption,
+                                      args.media_type, args.size_bytes, args.key)
+            print(f"✅ Job {job_id} ajouté à la file." if created else f"ℹ️ Job {job_id} déjà présent dans la file.")
+        else:
+            outcomes = run_workers(insta_id, ACCESS_TOKEN, args.workers, args.db, args.wait)
+            print(f"\n--- Jobs traités : {json.dumps(outcomes)} — état de la file : {json.dumps(queue_stats(connect(args.db)))} ---")
+            if outcomes.get(STATUS_FAILED):
+                sys.exit(1)
+    except GraphAPIError as e:
+        print(f"❌ Erreur Graph : {e}")
+        sys.exit(1)
@@ -0,0 +1,117 @@
+"""
+Description d'un Reel diaporama, indépendante du moteur de rendu.
+
+Une timeline est une suite de scènes (image fixe, durée, zoom, textes superposés) reliées
+par des fondus enchaînés de durée fixe. Elle reproduit la sémantique des scripts MoviePy :
+chaque scène dure `durée d'affichage + fondu` et chevauche la précédente de la durée du fondu
+(`concatenate_videoclips(..., padding=-fondu)` avec `CrossFadeIn`). Les moteurs (MoviePy de
+référence, ffmpeg natif) ne lisent que cette structure.
+"""
+import os
+from dataclasses import dataclass, field
+
+DEFAULT_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+# Formats de sortie (largeur, hauteur relatives) : Reel 9:16, publication du fil 4:5, carré 1:1
+OUTPUT_FORMATS = {"reel": (9, 16), "feed": (4, 5), "square": (1, 1)}
+
+
+@dataclass
+class TextOverlay:
+    """Texte affiché pendant toute une scène, position relative au cadre (coin haut-gauche)."""
+    text: str
+    position: tuple = (0.5, 0.5)
+    font_path: str = DEFAULT_FONT_PATH
+    font_size: int = 28
+    color: str = "white"
+    stroke_color: str = "black"
+    stroke_width: float = 0
+    opacity: float = 1.0
+
+
+@dataclass
+class Scene:
+    image_path: str
+    duration: float            # Durée totale du clip, fondu d'entrée compris
+    zoom_rate: float = 0.0     # Zoom avant progressif : échelle 1 + zoom_rate * t
+    overlays: list = field(default_factory=list)
+
+
+@dataclass
+class ReelTimeline:
+    scenes: list
+    transition: float = 0.0    # Durée des fondus enchaînés entre scènes
+    fps: int = 30
+    size: tuple = None         # (largeur, hauteur) ; par défaut, la taille de la première image
+
+    @classmethod
+    def from_images(cls, image_paths, display_duration, transition=0.0, fps=30, zoom_rate=0.0, size=None):
+        """Diaporama régulier : chaque image est affichée `display_duration` secondes hors fondus."""
+        scenes = [Scene(path, display_duration + transition, zoom_rate) for path in image_paths]
+        return cls(scenes, transition, fps, size)
+
+    def start_times(self):
+        """Instant de début de chaque scène (début de son fondu d'entrée)."""
+        starts, t = [], 0.0
+        for scene in self.scenes:
+            starts.append(t)
+            t += scene.duration - self.transition
+        return starts
+
+    @property
+    def duration(self):
+        if not self.scenes:
+            return 0.0
+        return self.start_times()[-1] + self.scenes[-1].duration
+
+    def frame_size(self):
+        """Taille de sortie (paire, exigée par yuv420p)."""
+        if self.size:
+            width, height = self.size
+        else:
+            from PIL import Image
+            with Image.open(self.scenes[0].image_path) as img:
+                width, height = img.size
+        return width - width % 2, height - height % 2
+
+    def validate(self):
+        if not self.scenes:
+            raise ValueError("Timeline vide : aucune scène à rendre.")
+        for scene in self.scenes:
+            if not os.path.exists(scene.image_path):
+                raise FileNotFoundError(scene.image_path)
+            if len(self.scenes) > 1 and scene.duration <= self.transition:
+                raise ValueError(f"Scène {scene.image_path} plus courte que le fondu ({self.transition}s).")
+
+
+@dataclass
+class VariantSpec:
+    """Une déclinaison d'un même jeu d'images : rythme, textes, fps et format de sortie."""
+    output_path: str
+    display_duration: float = 2.0
+    transition: float = 0.5
+    fps: int = 30
+    output_format: str = "reel"   # Clé de OUTPUT_FORMATS
+    width: int = None             # Par défaut, la largeur de la première image
+    zoom_rate: float = 0.0
+    overlays: list = None         # overlays[i] : liste de TextOverlay de la scène i
+    crf: int = 18
+    preset: str = "medium"
+
+    def frame_size(self, image_paths):
+        width = self.width
+        if width is None:
+            from PIL import Image
+            with Image.open(image_paths[0]) as img:
+                width = img.width
+        ratio_w, ratio_h = OUTPUT_FORMATS[self.output_format]
+        height = round(width * ratio_h / ratio_w)
+        return width - width % 2, height - height % 2
+
+    def timeline(self, image_paths):
+        timeline = ReelTimeline.from_images(
+            image_paths, self.display_duration, self.transition, self.fps, self.zoom_rate, self.frame_size(image_paths)
+        )
+        for scene, overlays in zip(timeline.scenes, self.overlays or []):
+            scene.overlays = list(overlays)
+        return timeline
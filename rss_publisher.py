@@ -1,24 +1,30 @@
 import os
 import requests
 import json
-import time
+import calendar
+import hashlib
+import threading
 import feedparser
 import io
+import re
+import html
 import mimetypes
 import base64
+import queue
+import argparse
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
 from bs4 import BeautifulSoup
 
-# --- NOUVEAUX IMPORTS POUR L'AUTHENTIFICATION ET VERTEX AI ---
-from google.cloud import aiplatform
-from google.cloud.aiplatform_v1beta1.services.prediction_service import PredictionServiceClient
-from google.cloud.aiplatform_v1beta1.types import Value 
-from google.oauth2 import service_account # NOUVEL IMPORT pour l'authentification
-# --- FIN DES NOUVEAUX IMPORTS ---
-
-from google.cloud import storage
-from google import genai
 from google.genai.errors import APIError
 
+# Identifiants et clients Google partagés (créés une seule fois par processus)
+from gcp_clients import get_gemini_client, get_prediction_client, get_gcs_bucket
+import llm_cache
+from media_cache import MEDIA_CACHE_DIR
+from gcs_upload import upload_content_addressed
+from graph_client import GraphAPIError, get_graph_client
+
 
 # ==============================================================================
 # 1. CONFIGURATION GLOBALE & SECRETS
@@ -27,15 +33,23 @@ from google.genai.errors import APIError
 # Variables Meta (Instagram/Facebook)
 PAGE_ID = os.getenv("FB_PAGE_ID")
 ACCESS_TOKEN = os.getenv("FB_ACCESS_TOKEN")
-GRAPH_BASE_URL = "https://graph.facebook.com/v19.0"
 
 # Variables Google Cloud Storage (GCS)
 GCS_SERVICE_ACCOUNT_KEY = os.getenv("GCS_SERVICE_ACCOUNT_KEY")
 GCS_BUCKET_NAME = "media-auto-instagram"
 GCS_PLACEHOLDER_URL = "https://picsum.photos/1200/800"
 
+# Téléchargement des médias (en flux, mémoire bornée)
+MEDIA_MAX_BYTES = 300 * 1024 * 1024  # Limite Instagram pour un Reel ; None pour désactiver
+MEDIA_CHUNK_SIZE = 1024 * 1024
+MEDIA_READ_AHEAD_CHUNKS = 16  # Morceaux téléchargés d'avance pendant l'envoi vers GCS
+
 # Variables Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = 'gemini-2.5-flash'
+# Un seul appel Gemini (JSON structuré) pour le prompt image + la légende ; 0 pour revenir aux deux appels
+GEMINI_COMBINED_CALL = os.getenv("GEMINI_COMBINED_CALL", "1") != "0"
+INSTAGRAM_CAPTION_MAX_LENGTH = 2200
 
 # Variables GCP/Vertex AI
 GCP_PROJECT_ID = "media-auto-instagram"
@@ -43,66 +57,362 @@ GCP_REGION = "us-central1"
 
 # Configuration RSS
 RSS_FEED_URL = "https://news.google.com/rss?hl=fr&gl=FR&ceid=FR:fr"
+# Liste des flux surveillés (variable RSS_FEED_URLS, URLs séparées par des virgules)
+RSS_FEED_URLS = [url.strip() for url in os.getenv("RSS_FEED_URLS", RSS_FEED_URL).split(",") if url.strip()]
+RSS_MAX_WORKERS = 8
 RSS_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
+# Cache local (ETag/Last-Modified et entrées déjà parsées de chaque flux)
+RSS_CACHE_FILE = os.path.join(MEDIA_CACHE_DIR, "rss_feeds.json")
+# Index des articles déjà publiés (fichier en ajout seul, une empreinte par ligne)
+PUBLISHED_INDEX_FILE = os.path.join(MEDIA_CACHE_DIR, "published_articles.txt")
+
+# Mode batch (--batch N) : nombre de workers par étape du pipeline
+BATCH_STAGE_WORKERS = {
+    "media": 3,    # Prompt Gemini + Imagen (ou média d'origine)
+    "upload": 4,   # Téléversement GCS
+    "caption": 4,  # Légende Gemini (seulement si l'appel combiné a échoué)
+    "publish": 1,  # Publication Instagram (une à la fois, quotas Meta)
+}
+
 # ==============================================================================
 # 2. FONCTIONS D'ACQUISITION DE DONNÉES ET DE MÉDIA
 # ==============================================================================
 
+class Article:
+    def __init__(self, title, link, media_url):
+        self.title = title
+        self.link = link
+        self.media_url = media_url
+
+
+# Commentaires et contenus de <script>/<style> complets : jamais analysés comme balises par html.parser
+_HTML_SKIPPED_RE = re.compile(r"<!--(?!-?>).*?-->|<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+# Ce qui reste après leur retrait (commentaire ou <script> sans fin, <!-->, CDATA, déclaration,
+# instruction de traitement, `</` hors balise fermante, balise fermante contenant un `<`)
+# est laissé à BeautifulSoup
+_HTML_UNSCANNABLE_RE = re.compile(r"<[!?]|<(?:script|style)\b|</(?![a-zA-Z])|</[^>]*<", re.IGNORECASE)
+# Nom de balise contenant un `<` (`<div<!-- ... -->`) : un commentaire ou un <script> y serait retiré à tort
+_TAG_NAME_WITH_LT_RE = re.compile(r"<[a-zA-Z][^\t\n\r\f />\x00]*<")
+_START_TAG_RE = re.compile(r"<([a-zA-Z][^\t\n\r\f />\x00]*)")
+# Un attribut `nom=valeur` à la fois (même grammaire tolérante que html.parser)
+_ATTR_RE = re.compile(r"""((?<=['"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*('[^']*'|"[^"]*"|(?!['"])[^>\s]*))?(?:\s|/(?!>))*""")
+_ATTR_SEPARATOR_RE = re.compile(r"(?:\s|/(?!>))*")
+_TAG_END_RE = re.compile(r"\s*/?>")
+
+def _scan_attributes(content_html, position):
+    """
+    Lit les attributs d'une balise ouvrante à partir de `position` (juste après son nom).
+    Retourne ({nom: valeur}, position après `>`), le dernier doublon l'emportant comme avec
+    BeautifulSoup, ou (None, position) si la balise est mal formée.
+    """
+    attrs = {}
+    position = _ATTR_SEPARATOR_RE.match(content_html, position).end()
+    while True:
+        end = _TAG_END_RE.match(content_html, position)
+        if end:
+            return attrs, end.end()
+        match = _ATTR_RE.match(content_html, position)
+        if not match or match.end() == position:
+            return None, position
+        name, has_value, value = match.groups()
+        if value and len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        attrs[name.lower()] = html.unescape(value) if has_value and value else ""
+        position = match.end()
+
+def find_first_image_src(content_html):
+    """
+    Retourne le src de la première image d'un fragment HTML (même résultat que BeautifulSoup).
+    Les commentaires sont retirés, puis les balises ouvrantes sont lues une à une, attribut par
+    attribut, jusqu'à la première <img> ; BeautifulSoup n'est utilisé que si une balise est mal
+    formée, ou si un commentaire, un <script> ou un CDATA ne peut pas être écarté sans ambiguïté.
+    """
+    if "<img" not in content_html.lower():
+        return None
+    stripped = _HTML_SKIPPED_RE.sub("", content_html)
+
+    if not _HTML_UNSCANNABLE_RE.search(stripped) and not _TAG_NAME_WITH_LT_RE.search(content_html):
+        position = 0
+        while True:
+            tag = _START_TAG_RE.search(stripped, position)
+            if not tag:
+                return None
+            attrs, position = _scan_attributes(stripped, tag.end())
+            if attrs is None:
+                break
+            if tag.group(1).lower() == "img":
+                return attrs.get("src") or None
+
+    soup = BeautifulSoup(content_html, 'html.parser')
+    img_tag = soup.find('img')
+    if img_tag and img_tag.get('src'):
+        return img_tag['src']
+    return None
+
 def extract_media_url_from_entry(entry):
     """Essaie de trouver l'URL d'une image ou d'une vidéo dans une entrée RSS."""
     
     if 'media_content' in entry:
         for media in entry.media_content:
             if 'url' in media and media.get('type', '').startswith(('image/', 'video/')):
-                print(f"    --> Média trouvé via media:content: {media.url}")
                 return media.url
     
     content_html = entry.get('description', '') or entry.get('summary', '') or entry.get('content', [{}])[0].get('value', '')
     
     if content_html:
-        soup = BeautifulSoup(content_html, 'html.parser')
-        img_tag = soup.find('img')
-        if img_tag and img_tag.get('src'):
-            print(f"    --> Image trouvée dans le contenu HTML: {img_tag['src']}")
-            return img_tag['src']
+        return find_first_image_src(content_html)
             
     return None
 
-def get_latest_rss_article():
-    """Récupère le dernier article et tente de trouver une URL média."""
-    print(f"\n--- Tentative de récupération RSS depuis : {RSS_FEED_URL} ---")
-    
+def load_rss_cache():
+    """Charge le cache des flux RSS (ETag, Last-Modified et entrées) depuis le disque."""
     try:
-        feed = feedparser.parse(RSS_FEED_URL, agent=RSS_USER_AGENT)
-        
-        if feed.status not in (200, 301, 302):
-             print(f"❌ Échec de la requête RSS. Statut HTTP: {feed.status}")
-             return None
+        with open(RSS_CACHE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_rss_cache(cache):
+    """Écrit le cache des flux RSS de manière atomique."""
+    os.makedirs(os.path.dirname(RSS_CACHE_FILE), exist_ok=True)
+    tmp_path = f"{RSS_CACHE_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_path, RSS_CACHE_FILE)
+
+def _entry_timestamp(entry):
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    return calendar.timegm(parsed) if parsed else 0
+
+def fetch_feed_entries(feed_url, cached=None):
+    """
+    Télécharge un flux RSS en GET conditionnel (ETag/Last-Modified).
+    Sur un 304, les entrées déjà parsées du cache sont réutilisées telles quelles.
+    """
+    cached = cached or {}
+    try:
+        feed = feedparser.parse(
+            feed_url,
+            agent=RSS_USER_AGENT,
+            etag=cached.get('etag'),
+            modified=cached.get('modified')
+        )
+        status = feed.get('status')
+
+        if status == 304:
+            print(f"    [304] Flux inchangé, entrées du cache réutilisées : {feed_url}")
+            return cached
+
+        if status not in (200, 301, 302):
+            print(f"❌ Échec de la requête RSS ({feed_url}). Statut HTTP: {status}")
+            return cached
+
+        entries = [
+            {
+                'title': entry.get('title', ''),
+                'link': entry.get('link', ''),
+                'published': _entry_timestamp(entry),
+                'media_url': extract_media_url_from_entry(entry),
+            }
+            for entry in feed.entries
+        ]
+        print(f"    [{status}] {len(entries)} entrées lues depuis : {feed_url}")
+        return {'etag': feed.get('etag'), 'modified': feed.get('modified'), 'entries': entries}
 
-        if feed.entries:
-            article = feed.entries[0]
-            print(f"✅ Article RSS trouvé: '{article.title}'")
-            
-            class Article:
-                def __init__(self, title, link, media_url):
-                    self.title = title
-                    self.link = link
-                    self.media_url = media_url
-            
-            media_url = extract_media_url_from_entry(article)
-            
-            return Article(article.title, article.link, media_url)
-        
-        print("❌ Flux RSS valide mais aucune entrée trouvée.")
-        return None
-        
     except Exception as e:
-        print(f"❌ Erreur critique lors de la lecture du flux RSS. Erreur: {e}")
+        print(f"❌ Erreur lors de la lecture du flux RSS {feed_url}. Erreur: {e}")
+        return cached
+
+def fetch_all_feed_entries(feed_urls=None):
+    """Récupère tous les flux configurés en parallèle et retourne leurs entrées, les plus récentes d'abord."""
+    feed_urls = feed_urls or RSS_FEED_URLS
+    cache = load_rss_cache()
+
+    with ThreadPoolExecutor(max_workers=min(RSS_MAX_WORKERS, len(feed_urls))) as pool:
+        results = list(pool.map(lambda url: fetch_feed_entries(url, cache.get(url)), feed_urls))
+
+    for url, result in zip(feed_urls, results):
+        if result:
+            cache[url] = result
+    try:
+        save_rss_cache(cache)
+    except OSError as e:
+        print(f"    Avertissement : impossible d'écrire le cache RSS ({e}).")
+
+    entries = [entry for result in results for entry in result.get('entries', [])]
+    entries.sort(key=lambda entry: entry.get('published', 0), reverse=True)
+    return entries
+
+# --- Index des articles déjà publiés ---
+
+_published_index = None
+_published_index_lock = threading.Lock()
+
+def _normalize_link(link):
+    parts = urlsplit(link.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+
+def article_keys(title, link):
+    """Empreintes courtes d'un article : lien normalisé et titre normalisé."""
+    keys = []
+    if link:
+        keys.append('l:' + hashlib.sha256(_normalize_link(link).encode('utf-8')).hexdigest()[:20])
+    if title:
+        normalized_title = ' '.join(title.lower().split())
+        keys.append('t:' + hashlib.sha256(normalized_title.encode('utf-8')).hexdigest()[:20])
+    return keys
+
+def load_published_index():
+    """Charge (une seule fois) l'index des articles publiés dans un set en mémoire."""
+    global _published_index
+    with _published_index_lock:
+        if _published_index is None:
+            try:
+                with open(PUBLISHED_INDEX_FILE, encoding='utf-8') as f:
+                    _published_index = {line.strip() for line in f if line.strip()}
+            except FileNotFoundError:
+                _published_index = set()
+        return _published_index
+
+def is_article_published(title, link):
+    index = load_published_index()
+    return any(key in index for key in article_keys(title, link))
+
+def mark_article_published(title, link):
+    """Ajoute les empreintes de l'article à l'index (mémoire + fichier)."""
+    index = load_published_index()
+    keys = [key for key in article_keys(title, link) if key not in index]
+    if not keys:
+        return
+    with _published_index_lock:
+        os.makedirs(os.path.dirname(PUBLISHED_INDEX_FILE), exist_ok=True)
+        with open(PUBLISHED_INDEX_FILE, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{key}\n" for key in keys))
+        index.update(keys)
+
+def get_latest_rss_articles(entries, limit=1):
+    """Retourne les `limit` articles les plus récents (tous flux confondus) qui n'ont pas encore été publiés."""
+    articles = []
+    seen_keys = set()
+    for entry in entries:
+        keys = article_keys(entry['title'], entry['link'])
+        # Un même article peut apparaître dans plusieurs flux
+        if is_article_published(entry['title'], entry['link']) or seen_keys.intersection(keys):
+            continue
+        seen_keys.update(keys)
+        print(f"✅ Article RSS trouvé: '{entry['title']}'")
+        if entry.get('media_url'):
+            print(f"    --> Média trouvé dans l'entrée : {entry['media_url']}")
+        articles.append(Article(entry['title'], entry['link'], entry.get('media_url')))
+        if len(articles) >= limit:
+            break
+
+    if not articles:
+        print("ℹ️ Tous les articles des flux ont déjà été publiés.")
+    return articles
+
+def get_latest_rss_article(entries=None):
+    """Retourne l'article le plus récent (tous flux confondus) qui n'a pas encore été publié."""
+    if entries is None:
+        print(f"\n--- Tentative de récupération RSS depuis {len(RSS_FEED_URLS)} flux ---")
+        entries = fetch_all_feed_entries()
+    if not entries:
+        print("❌ Aucune entrée trouvée dans les flux RSS.")
         return None
 
-def fetch_media_data(url):
-    """Télécharge les données d'un média (image ou vidéo) à partir d'une URL."""
+    articles = get_latest_rss_articles(entries, limit=1)
+    return articles[0] if articles else None
+
+class MediaStream(io.RawIOBase):
+    """
+    Flux en lecture seule sur le corps d'une réponse HTTP.
+    Un thread télécharge les morceaux d'avance dans une file bornée, ce qui permet
+    à l'upload GCS d'envoyer un morceau pendant que le suivant se télécharge.
+    Le téléchargement est interrompu dès que max_bytes est dépassé.
+    """
+
+    _END = object()
+
+    def __init__(self, response, max_bytes=MEDIA_MAX_BYTES, chunk_size=MEDIA_CHUNK_SIZE):
+        super().__init__()
+        self._response = response
+        self._chunks = queue.Queue(maxsize=MEDIA_READ_AHEAD_CHUNKS)
+        self._pending = memoryview(b'')
+        self._position = 0
+        self._stopped = threading.Event()
+        self.max_bytes = max_bytes
+        content_length = response.headers.get('Content-Length')
+        self.size = int(content_length) if content_length and content_length.isdigit() else None
+
+        self._reader = threading.Thread(target=self._download, args=(chunk_size,), daemon=True)
+        self._reader.start()
+
+    def _download(self, chunk_size):
+        try:
+            for chunk in self._response.iter_content(chunk_size=chunk_size):
+                if self._stopped.is_set():
+                    return
+                if chunk:
+                    self._chunks.put(chunk)
+            self._chunks.put(self._END)
+        except Exception as e:
+            self._chunks.put(e)
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = self._chunks.get()
+            if chunk is self._END:
+                self._chunks.put(self._END)
+                return 0
+            if isinstance(chunk, Exception):
+                raise chunk
+            self._pending = memoryview(chunk)
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        self._position += size
+        if self.max_bytes is not None and self._position > self.max_bytes:
+            raise ValueError(f"Média trop volumineux (plus de {self.max_bytes} octets).")
+        return size
+
+    def read(self, size=-1):
+        # L'upload résumable GCS considère une lecture courte comme la fin du flux :
+        # on remplit donc le tampon demandé jusqu'au bout (ou jusqu'à la fin du média).
+        if size is None or size < 0:
+            return self.readall()
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < size:
+            read = self.readinto(view[filled:])
+            if not read:
+                break
+            filled += read
+        return bytes(view[:filled])
+
+    def close(self):
+        if not self.closed:
+            self._stopped.set()
+            # Débloque le thread de téléchargement s'il attend une place dans la file
+            while not self._chunks.empty():
+                self._chunks.get_nowait()
+            self._response.close()
+        super().close()
+
+
+def fetch_media_data(url, max_bytes=MEDIA_MAX_BYTES):
+    """
+    Ouvre le téléchargement d'un média (image ou vidéo) à partir d'une URL.
+    Retourne un MediaStream lu par morceaux : le média n'est jamais chargé entièrement en mémoire.
+    """
     if not url:
         return None, None, None
     try:
@@ -112,11 +422,18 @@ def fetch_media_data(url):
         
         if not content_type.startswith(('image/', 'video/')):
             print(f"    Avertissement : Type de contenu non supporté ({content_type}).")
+            r.close()
+            return None, None, None
+
+        content_length = r.headers.get('Content-Length', '')
+        if max_bytes is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            print(f"    Avertissement : Média trop volumineux ({content_length} octets > {max_bytes}).")
+            r.close()
             return None, None, None
 
         extension = mimetypes.guess_extension(content_type) or '.dat'
         
-        return r.content, extension, content_type
+        return MediaStream(r, max_bytes=max_bytes), extension, content_type
     except Exception as e:
         print(f"    ❌ Échec du téléchargement du média depuis {url} : {e}")
         return None, None, None
@@ -126,51 +443,46 @@ def fetch_media_data(url):
 # 3. FONCTIONS IA & CLOUD STORAGE (GCS)
 # ==============================================================================
 
-def generate_and_fetch_image_data(topic):
+def generate_and_fetch_image_data(topic, image_prompt=None):
     """
-    1. Génère le prompt via Gemini, en incluant la contrainte bleu/blanc/rouge.
+    1. Génère le prompt via Gemini, en incluant la contrainte bleu/blanc/rouge
+       (sauf si `image_prompt` est déjà fourni par l'appel combiné).
     2. Génère l'image via Vertex AI (PredictionServiceClient) en s'authentifiant explicitement.
     """
     
     # --- 1. Génération du prompt (via Gemini) ---
-    if not GEMINI_API_KEY:
+    if image_prompt:
+        print(f"--- 1. Prompt IA déjà généré (appel combiné) : '{image_prompt}' ---")
+    elif not GEMINI_API_KEY:
         print("❌ Erreur: GEMINI_API_KEY non configurée. Utilisation de l'image de secours.")
         return fetch_media_data(GCS_PLACEHOLDER_URL)
-        
-    print(f"--- 1. Génération du prompt IA pour Vertex AI : '{topic}' ---")
-    try:
-        gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-        
-        description_prompt = (
-            f"Génère une description photo-réaliste, en une seule phrase, pour une image 1:1 "
-            f"illustrant symboliquement le sujet : '{topic}'. L'image doit utiliser des couleurs dramatiques, "
-            f"éviter le texte, et IMPÉRATIVEMENT avoir un arrière-plan dominant de bleu, blanc et rouge. "
-            f"Style : Photographie de qualité professionnelle, composition percutante."
-        )
-        
-        response_desc = gemini_client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=description_prompt
-        )
-        image_prompt = response_desc.text.strip()
-        print(f"✅ Prompt IA généré: '{image_prompt}'")
-    except Exception as e:
-        print(f"❌ Échec de la génération du prompt Gemini: {e}")
-        return fetch_media_data(GCS_PLACEHOLDER_URL)
+    else:
+        print(f"--- 1. Génération du prompt IA pour Vertex AI : '{topic}' ---")
+        try:
+            gemini_client = get_gemini_client()
+            
+            description_prompt = (
+                f"Génère une description photo-réaliste, en une seule phrase, pour une image 1:1 "
+                f"illustrant symboliquement le sujet : '{topic}'. L'image doit utiliser des couleurs dramatiques, "
+                f"éviter le texte, et IMPÉRATIVEMENT avoir un arrière-plan dominant de bleu, blanc et rouge. "
+                f"Style : Photographie de qualité professionnelle, composition percutante."
+            )
+            
+            image_prompt = llm_cache.cached_generate(
+                GEMINI_MODEL,
+                description_prompt,
+                lambda: gemini_client.models.generate_content(model=GEMINI_MODEL, contents=description_prompt).text
+            ).strip()
+            print(f"✅ Prompt IA généré: '{image_prompt}'")
+        except Exception as e:
+            print(f"❌ Échec de la génération du prompt Gemini: {e}")
+            return fetch_media_data(GCS_PLACEHOLDER_URL)
     
     # --- 2. Appel à l'API Vertex AI (Génération d'images) via PredictionServiceClient ---
     print("\n--- 2. Appel à l'API Vertex AI (Génération d'images) via PredictionServiceClient ---")
     try:
-        # Décodage de la clé de service Base64 pour l'authentification explicite
-        key_json = base64.b64decode(GCS_SERVICE_ACCOUNT_KEY).decode('utf-8')
-        credentials_info = json.loads(key_json)
-        credentials = service_account.Credentials.from_service_account_info(credentials_info)
-        
-        aiplatform.init(project=GCP_PROJECT_ID, location=GCP_REGION)
-        client_options = {"api_endpoint": f"{GCP_REGION}-aiplatform.googleapis.com"}
-        
-        # Le client est créé avec les identifiants explicites
-        client = PredictionServiceClient(client_options=client_options, credentials=credentials)
+        # Client authentifié avec la clé de service décodée (créé une seule fois)
+        client = get_prediction_client(GCP_REGION)
 
         instances_json = [{"prompt": image_prompt}]
         
@@ -224,6 +536,72 @@ def generate_and_fetch_image_data(topic):
         return fetch_media_data(GCS_PLACEHOLDER_URL)
 
 
+def parse_prompt_and_caption(response_text, article_link):
+    """
+    Valide la réponse JSON de l'appel combiné et retourne (prompt image, légende finale).
+    Lève ValueError si un champ manque, est mal typé, ou si la légende dépasse la limite Instagram.
+    """
+    data = json.loads(response_text)
+    if not isinstance(data, dict):
+        raise ValueError("la réponse n'est pas un objet JSON")
+
+    image_prompt = data.get('image_prompt')
+    caption = data.get('caption')
+    hashtags = data.get('hashtags')
+    if not isinstance(image_prompt, str) or not image_prompt.strip():
+        raise ValueError("champ 'image_prompt' manquant ou vide")
+    if not isinstance(caption, str) or not caption.strip():
+        raise ValueError("champ 'caption' manquant ou vide")
+    if not isinstance(hashtags, list) or not all(isinstance(tag, str) for tag in hashtags):
+        raise ValueError("champ 'hashtags' invalide (liste de chaînes attendue)")
+
+    tags = ' '.join('#' + tag.strip().lstrip('#').replace(' ', '') for tag in hashtags if tag.strip().lstrip('#'))
+    # Même mise en forme que la légende classique : trois lignes, les hashtags, puis le lien
+    full_caption = f"{caption.strip()}\n\n\n{tags}\n{article_link}"
+    if len(full_caption) > INSTAGRAM_CAPTION_MAX_LENGTH:
+        raise ValueError(f"légende trop longue ({len(full_caption)} caractères)")
+    return image_prompt.strip(), full_caption
+
+
+def generate_prompt_and_caption(topic, article_link):
+    """
+    Un seul appel Gemini (réponse JSON) pour obtenir à la fois le prompt Vertex AI et la légende.
+    Retourne (image_prompt, caption), ou (None, None) si l'appel ou la validation échoue :
+    l'appelant revient alors aux deux appels séparés.
+    """
+    if not GEMINI_API_KEY:
+        return None, None
+
+    print("--- Génération combinée (prompt image + légende) via Gemini ---")
+    prompt = (
+        f"Tu prépares un post Instagram de 'flash info' sur l'article suivant : '{topic}'.\n"
+        f"Réponds UNIQUEMENT avec un objet JSON contenant les clés :\n"
+        f"- \"image_prompt\" : une description photo-réaliste, en une seule phrase, pour une image 1:1 "
+        f"illustrant symboliquement le sujet. L'image doit utiliser des couleurs dramatiques, éviter le texte, "
+        f"et IMPÉRATIVEMENT avoir un arrière-plan dominant de bleu, blanc et rouge. "
+        f"Style : Photographie de qualité professionnelle, composition percutante.\n"
+        f"- \"caption\" : une légende concise (moins de 2000 caractères) et percutante au format "
+        f"'🔴 FLASH INFO : (Titre accrocheur et résumé)', sans hashtags ni lien.\n"
+        f"- \"hashtags\" : une liste de 3 à 8 hashtags pertinents (ex: [\"#Ukraine\", \"#Politique\", \"#FlashInfo\"])."
+    )
+    config = {"response_mime_type": "application/json"}
+
+    def generate():
+        text = get_gemini_client().models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config).text
+        # Validation avant la mise en cache : une réponse invalide n'est jamais réutilisée
+        parse_prompt_and_caption(text, article_link)
+        return text
+
+    try:
+        response_text = llm_cache.cached_generate(GEMINI_MODEL, prompt, generate, params=config)
+        image_prompt, caption = parse_prompt_and_caption(response_text, article_link)
+        print("✅ Prompt IA et légende générés en un appel.")
+        return image_prompt, caption
+    except Exception as e:
+        print(f"⚠️ Appel combiné Gemini inexploitable ({e}). Repli sur les deux appels séparés.")
+        return None, None
+
+
 def generate_ai_caption(topic, article_link):
     """Génère une légende de post Instagram et des hashtags via l'IA."""
     if not GEMINI_API_KEY:
@@ -231,7 +609,7 @@ def generate_ai_caption(topic, article_link):
         
     print("--- Génération de légende IA en cours ---")
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = get_gemini_client()
         
         prompt = (
             f"Agis comme un rédacteur de 'flash info' sur Instagram. Écris une légende concise "
@@ -241,44 +619,44 @@ def generate_ai_caption(topic, article_link):
             f"Ajoute le lien de l'article à la fin de la légende : {article_link}"
         )
         
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
+        caption = llm_cache.cached_generate(
+            GEMINI_MODEL,
+            prompt,
+            lambda: client.models.generate_content(model=GEMINI_MODEL, contents=prompt).text
         )
         
-        return response.text.strip()
+        return caption.strip()
         
     except Exception as e:
         print(f"❌ Erreur de génération IA : {e}")
         return f"🔴 FLASH INFO : Le sujet du jour est '{topic}'. Plus de détails : {article_link} #Actualité"
 
 
-def upload_to_gcs_and_get_url(data, file_name, content_type):
-    """Téléverse un fichier binaire vers GCS et retourne son URL publique."""
+def upload_to_gcs_and_get_url(data, name_prefix, file_extension, content_type):
+    """
+    Téléverse un média vers GCS et retourne son URL publique.
+    `data` est soit des octets, soit un flux lisible (MediaStream). Le nom de l'objet est dérivé
+    du SHA-256 du contenu : un média déjà présent dans le bucket n'est pas renvoyé.
+    """
     if not GCS_SERVICE_ACCOUNT_KEY or not GCS_BUCKET_NAME:
         print("❌ Erreur: GCS_SERVICE_ACCOUNT_KEY ou GCS_BUCKET_NAME non configuré.")
         return None
         
-    print(f"--- Tentative de téléversement vers GCS: {file_name} ---")
+    print(f"--- Tentative de téléversement vers GCS: {name_prefix}_<sha256>{file_extension} ---")
     
     try:
-        # La clé Base64 est décodée pour obtenir le JSON du compte de service
-        key_json = base64.b64decode(GCS_SERVICE_ACCOUNT_KEY).decode('utf-8')
-        credentials_info = json.loads(key_json)
-        
-        # On utilise le JSON décodé pour l'authentification GCS
-        client = storage.Client.from_service_account_info(credentials_info)
-        
-        bucket = client.bucket(GCS_BUCKET_NAME)
-        blob = bucket.blob(file_name)
-        
-        blob.upload_from_string(data, content_type=content_type)
+        # Bucket authentifié avec le JSON décodé du compte de service (créé une seule fois)
+        bucket = get_gcs_bucket(GCS_BUCKET_NAME)
+        blob, uploaded = upload_content_addressed(bucket, data, name_prefix, file_extension, content_type)
         
         # Ligne SUPPRIMÉE (blob.make_public()) : pour éviter l'erreur UBLA/ACL.
         # L'accès public est maintenant géré uniquement par la configuration IAM du bucket (action manuelle).
         
         gcs_url = blob.public_url # Ceci utilise l'URL publique.
-        print(f"✅ Téléversement GCS réussi. URL publique: {gcs_url}")
+        if uploaded:
+            print(f"✅ Téléversement GCS réussi. URL publique: {gcs_url}")
+        else:
+            print(f"✅ Média déjà présent sur GCS, téléversement ignoré. URL publique: {gcs_url}")
         return gcs_url
     
     except Exception as e:
@@ -286,6 +664,10 @@ def upload_to_gcs_and_get_url(data, file_name, content_type):
         print("Piste: Si le code d'erreur HTTP est 400 (ACL/UBLA), assurez-vous que le rôle 'Storage Object Viewer' est donné à 'allUsers' au niveau du bucket.")
         return None
 
+    finally:
+        if hasattr(data, 'close'):
+            data.close()
+
 
 # ==============================================================================
 # 4. FONCTIONS DE PUBLICATION INSTAGRAM
@@ -297,45 +679,23 @@ def get_instagram_business_id():
           print("❌ Erreur: PAGE_ID ou ACCESS_TOKEN manquant pour l'API Meta.")
           return None
           
-    url = f"{GRAPH_BASE_URL}/{PAGE_ID}?fields=instagram_business_account&access_token={ACCESS_TOKEN}"
     try:
-        r = requests.get(url)
-        r.raise_for_status()
-        data = r.json()
-        if 'instagram_business_account' in data:
-            return data['instagram_business_account']['id']
-        else:
-            print("❌ Erreur: Compte Instagram Business non trouvé lié à la Page Facebook.")
-            return None
-    except requests.exceptions.HTTPError as e:
-        print(f"❌ Échec de la requête d'ID Instagram (HTTP): {e}")
-        return None
-    except Exception as e:
-        print(f"❌ Erreur lors de la récupération de l'ID Instagram : {e}")
+        insta_id = get_graph_client(ACCESS_TOKEN).get_instagram_business_id(PAGE_ID)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la requête d'ID Instagram : {e}")
         return None
+    if not insta_id:
+        print("❌ Erreur: Compte Instagram Business non trouvé lié à la Page Facebook.")
+    return insta_id
 
-def check_media_status(creation_id, access_token):
-    """Vérifie l'état de traitement du conteneur de média Instagram."""
-    status_url = f"{GRAPH_BASE_URL}/{creation_id}?fields=status_code&access_token={access_token}"
-    max_checks = 10 
-    for i in range(max_checks):
-        r = requests.get(status_url)
-        data = r.json()
-        status = data.get('status_code')
-        print(f"    [Vérification {i+1}/{max_checks}] Statut: {status}")
-        
-        if status == 'FINISHED':
-            return True
-        if status == 'ERROR':
-            print(f"    ❌ Erreur de traitement du conteneur {creation_id}. Détails: {json.dumps(data, indent=4)}")
-            return False
-            
-        time.sleep(5) 
-        
-    print(f"    ❌ Délai d'attente dépassé pour le conteneur {creation_id}.")
-    return False
+def check_media_status(creation_id, access_token, media_type='IMAGE', size_bytes=None):
+    """
+    Attend la fin du traitement du conteneur de média Instagram (poller adaptatif partagé).
+    Le délai maximal croît avec la taille du média (`size_bytes`).
+    """
+    return get_graph_client(access_token).wait_for_container(creation_id, media_type, size_bytes)
 
-def publish_instagram_media(insta_id, media_url, caption, content_type): 
+def publish_instagram_media(insta_id, media_url, caption, content_type, size_bytes=None): 
     """Effectue la publication d'image ou de vidéo en deux étapes sur Instagram."""
     
     is_video = content_type.startswith('video/') 
@@ -343,108 +703,181 @@ def publish_instagram_media(insta_id, media_url, caption, content_type):
     media_type_str = 'vidéo/Reel' if is_video else 'image/Photo'
 
     print(f"\n--- Début de la publication {media_type_str} ({media_type_ig}) sur Instagram ---")
+    graph = get_graph_client(ACCESS_TOKEN)
     
     # 1. CRÉER LE CONTENEUR MÉDIA
-    media_container_url = f"{GRAPH_BASE_URL}/{insta_id}/media"
-    
-    container_payload = {
-        "media_type": media_type_ig,          
-        "caption": caption,
-        "access_token": ACCESS_TOKEN
-    }
-    
-    if is_video:
-        container_payload["video_url"] = media_url
-        container_payload["thumb_offset"] = 0
-    else:
-        container_payload["image_url"] = media_url
-
-    r1 = requests.post(media_container_url, data=container_payload)
-    data1 = r1.json()
-    
-    if r1.status_code != 200 or 'id' not in data1:
-        print(f"❌ Échec de la création du conteneur. Statut: {r1.status_code}")
-        print(f"Erreur Meta (Conteneur {media_type_ig}):", json.dumps(data1, indent=4))
+    try:
+        creation_id = graph.create_media_container(
+            insta_id, media_url, caption, media_type_ig,
+            thumb_offset=0 if is_video else None
+        )
+    except GraphAPIError as e:
+        print(f"❌ Échec de la création du conteneur. Statut: {e.status_code}")
+        print(f"Erreur Meta (Conteneur {media_type_ig}):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
         
-    creation_id = data1['id']
     print(f"✅ Conteneur {media_type_ig} créé avec ID: {creation_id}")
     
-    if not check_media_status(creation_id, ACCESS_TOKEN):
+    if not check_media_status(creation_id, ACCESS_TOKEN, media_type_ig, size_bytes):
         return False
     
     # 2. PUBLIER LE CONTENEUR MÉDIA
     print(f"\nÉtape 2/2: Publication du conteneur {media_type_ig}...")
-    publish_url = f"{GRAPH_BASE_URL}/{insta_id}/media_publish"
-    publish_payload = { "creation_id": creation_id, "access_token": ACCESS_TOKEN }
-    
-    r2 = requests.post(publish_url, data=publish_payload)
-    data2 = r2.json()
-    
-    if r2.status_code == 200 and 'id' in data2:
-        print("="*50)
-        print(f"✅ PUBLICATION {media_type_ig} INSTAGRAM DÉCLENCHÉE AVEC SUCCÈS !")
-        print(f"Publication ID: {data2['id']}")
-        print("==================================================")
-        return True
-    else:
-        print(f"❌ Échec de la publication finale Instagram. Statut: {r2.status_code}")
-        print("Erreur Meta (Publication finale):", json.dumps(data2, indent=4))
+    try:
+        media_id = graph.publish_container(insta_id, creation_id)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la publication finale Instagram. Statut: {e.status_code}")
+        print("Erreur Meta (Publication finale):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
 
+    print("="*50)
+    print(f"✅ PUBLICATION {media_type_ig} INSTAGRAM DÉCLENCHÉE AVEC SUCCÈS !")
+    print(f"Publication ID: {media_id}")
+    print("==================================================")
+    return True
+
 
 # ==============================================================================
-# 5. MAIN EXECUTION
+# 5. PIPELINE DE PUBLICATION
+# ==============================================================================
+
+def acquire_article_media(article):
+    """
+    Obtient le média d'un article : image IA en priorité, sinon le média d'origine.
+    Retourne (media_data, file_extension, content_type, caption) ; caption n'est renseignée
+    que si l'appel Gemini combiné a réussi (sinon elle est générée à l'étape légende).
+    """
+    image_prompt, caption = None, None
+    if GEMINI_COMBINED_CALL:
+        image_prompt, caption = generate_prompt_and_caption(article.title, article.link)
+
+    print(f"\n--> Génération d'image IA avec fond bleu/blanc/rouge pour : '{article.title}'")
+    media_data, file_extension, content_type = generate_and_fetch_image_data(article.title, image_prompt)
+
+    # Si l'IA échoue, on tente de récupérer le média de l'article (logique inversée)
+    if not media_data and article.media_url:
+        print("\n--> Génération IA échouée. REPLI sur le média d'origine.")
+        media_data, file_extension, content_type = fetch_media_data(article.media_url)
+
+    # Si tout échoue, c'est l'étape generate_and_fetch_image_data qui retourne le placeholder
+    return media_data, file_extension, content_type, caption
+
+def run_publish_pipeline(articles, insta_business_id, stage_workers=None):
+    """
+    Fait passer les articles dans le pipeline média -> GCS -> légende -> publication.
+    Chaque étape dispose de son propre pool (concurrence bornée par étape), de sorte que
+    l'image d'un article se génère pendant que le précédent est téléversé ou publié.
+    Pour un même article, l'upload GCS et la légende tournent en parallèle ; `insta_business_id`
+    peut être un Future (résolution en cours), attendu seulement avant la création du conteneur.
+    Retourne le nombre d'articles publiés.
+    """
+    stage_workers = {**BATCH_STAGE_WORKERS, **(stage_workers or {})}
+    pools = {
+        stage: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"rss-{stage}")
+        for stage, workers in stage_workers.items()
+    }
+
+    def process_article(article):
+        # La légende ne dépend que de l'article : sans appel combiné, elle se génère pendant le média
+        caption_future = None if GEMINI_COMBINED_CALL else pools["caption"].submit(generate_ai_caption, article.title, article.link)
+
+        media_data, file_extension, content_type, caption = pools["media"].submit(acquire_article_media, article).result()
+        if not media_data:
+            print(f"❌ Abandon de '{article.title}' : impossible d'obtenir des données média (IA, origine ou placeholder).")
+            if caption_future:
+                caption_future.cancel()
+            return False
+
+        # Upload et légende (si l'appel combiné ne l'a pas fournie) en parallèle ; jointure avant le conteneur
+        if not caption and caption_future is None:
+            caption_future = pools["caption"].submit(generate_ai_caption, article.title, article.link)
+        media_type_base = 'image' if content_type.startswith('image/') else 'video'
+        # Taille connue avant l'upload (octets générés ou Content-Length) : délai d'attente du conteneur
+        size_bytes = len(media_data) if isinstance(media_data, (bytes, bytearray)) else getattr(media_data, 'size', None)
+        final_media_url = pools["upload"].submit(
+            upload_to_gcs_and_get_url, media_data, f"rss_{media_type_base}", file_extension, content_type
+        ).result()
+        if not final_media_url:
+            print(f"❌ Abandon de '{article.title}' : impossible de téléverser le média vers GCS.")
+            if caption_future:
+                caption_future.cancel()
+            return False
+
+        if not caption:
+            caption = caption_future.result()
+        print(f"\nLégende générée (début) : {caption[:50]}...")
+
+        insta_id = insta_business_id.result() if isinstance(insta_business_id, Future) else insta_business_id
+        if not insta_id:
+            print(f"❌ Abandon de '{article.title}' : ID Instagram Business indisponible.")
+            return False
+
+        published = pools["publish"].submit(
+            publish_instagram_media, insta_id, final_media_url, caption, content_type, size_bytes
+        ).result()
+        if published:
+            mark_article_published(article.title, article.link)
+        return published
+
+    def process(article):
+        # Une erreur inattendue sur un article (média, upload, Gemini, Graph) n'interrompt pas le lot
+        try:
+            return process_article(article)
+        except Exception as e:
+            print(f"❌ Abandon de '{article.title}' : erreur inattendue ({type(e).__name__}: {e}).")
+            return False
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(articles), thread_name_prefix="rss-article") as driver:
+            results = list(driver.map(process, articles))
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    return sum(1 for published in results if published)
+
+
+# ==============================================================================
+# 6. MAIN EXECUTION
 # ==============================================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publie les derniers articles RSS sur Instagram.")
+    parser.add_argument("--batch", type=int, default=1, metavar="N",
+                        help="Nombre de nouveaux articles à publier dans cette exécution (défaut : 1)")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Ignore le cache disque des réponses Gemini (équivalent à LLM_CACHE_BYPASS=1)")
+    args = parser.parse_args()
+    if args.no_llm_cache:
+        llm_cache.LLM_CACHE_BYPASS = True
+
     if not all([PAGE_ID, ACCESS_TOKEN, GEMINI_API_KEY, GCS_SERVICE_ACCOUNT_KEY]):
         print("Erreur : Les Secrets GitHub ne sont pas tous définis (FB, GEMINI, GCS KEY requis).")
         exit(1)
 
-    # 1. ACQUISITION DE L'ARTICLE RSS
-    article = get_latest_rss_article()
-    if not article:
+    # 1. ACQUISITION DES ARTICLES RSS
+    print(f"\n--- Tentative de récupération RSS depuis {len(RSS_FEED_URLS)} flux ---")
+    entries = fetch_all_feed_entries()
+    if not entries:
+        print("❌ Aucune entrée trouvée dans les flux RSS.")
         exit(1)
 
-    topic = article.title
-    article_link = article.link 
-    
-    media_data, file_extension, content_type = None, None, None
+    articles = get_latest_rss_articles(entries, limit=max(1, args.batch))
+    if not articles:
+        # Rien de nouveau : on s'arrête avant tout appel payant (Gemini, Vertex AI, GCS)
+        exit(0)
 
-    # --- 2. LOGIQUE DE SÉLECTION DU MÉDIA (Priorité à la génération IA) ---
-    
-    print("\n--> Exécution de la génération d'image IA avec fond bleu/blanc/rouge.")
-    media_data, file_extension, content_type = generate_and_fetch_image_data(topic)
+    # 2. ID INSTAGRAM (résolu une seule fois pour tout le lot, pendant la génération des médias)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="rss-ig-id") as lookup:
+        insta_business_id = lookup.submit(get_instagram_business_id)
 
-    # Si l'IA échoue, on tente de récupérer le média de l'article (logique inversée)
-    if not media_data and article.media_url:
-         print("\n--> Génération IA échouée. REPLI sur le média d'origine.")
-         media_data, file_extension, content_type = fetch_media_data(article.media_url)
-    
-    # Si tout échoue, c'est l'étape generate_and_fetch_image_data qui retourne le placeholder
-    if not media_data:
-        print("❌ Abandon : Impossible d'obtenir des données média (IA, origine ou placeholder).")
+        # 3. MÉDIA -> GCS + LÉGENDE -> PUBLICATION
+        published_count = run_publish_pipeline(articles, insta_business_id)
+
+    if not insta_business_id.result():
+        print("❌ Publication Instagram annulée car l'ID Business n'a pas pu être récupéré.")
         exit(1)
-        
-    # 3. PRÉPARATION ET TÉLÉVERSEMENT VERS GCS
-    media_type_base = 'image' if content_type.startswith('image/') else 'video'
-    file_name = f"rss_{media_type_base}_{int(time.time())}{file_extension}"
-        
-    final_media_url = upload_to_gcs_and_get_url(media_data, file_name, content_type=content_type)
-    if not final_media_url:
-        print("❌ Abandon : Impossible de téléverser le média vers GCS.")
+    print(f"✅ ID Instagram Business trouvé: {insta_business_id.result()}")
+    print(f"\n=== {published_count}/{len(articles)} article(s) publié(s) ===")
+    if not published_count:
         exit(1)
-        
-    # 4. GÉNÉRATION DE LA LÉGENDE
-    caption = generate_ai_caption(topic, article_link=article.link) 
-    print(f"\nLégende générée (début) : {caption[:50]}...")
-    
-    # 5. PUBLICATION INSTAGRAM
-    insta_business_id = get_instagram_business_id()
-    
-    if insta_business_id:
-        print(f"✅ ID Instagram Business trouvé: {insta_business_id}")
-        publish_instagram_media(insta_business_id, final_media_url, caption, content_type)
-    else:
-        print("❌ Publication Instagram annulée car l'ID Business n'a pas pu être récupéré.")
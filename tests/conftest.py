@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# Les modules du dépôt sont des scripts à la racine
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import graph_client  # noqa: E402
+from graph_client import GraphClient  # noqa: E402
+
+TRANSIENT_ERROR = {"error": {"message": "Service temporarily unavailable", "type": "OAuthException", "code": 2}}
+PUBLISH_LIMIT_ERROR = {"error": {"message": "Application request limit reached", "type": "OAuthException",
+                                 "code": 9, "error_subcode": 2207042}}
+
+
+class FakeGraph:
+    """
+    Faux serveur Graph (état partagé par les requêtes HTTP) :
+    - statut des conteneurs : scripts de réponses par conteneur, chaque vérification consomme la
+      suivante et la dernière se répète ; un dict est renvoyé comme corps d'erreur HTTP 400 ;
+    - conteneurs créés par POST {ig}/media : script `container_status` ;
+    - POST {ig}/media_publish : `publish_error` (code HTTP, corps) si défini, sinon publication ;
+    - GET {ig}/content_publishing_limit : `quota_total` / `quota_usage`.
+    """
+
+    def __init__(self, scripts=None, container_status=("FINISHED",), publish_error=None, quota_total=25, quota_usage=0):
+        self.scripts = {creation_id: list(responses) for creation_id, responses in (scripts or {}).items()}
+        self.container_status = list(container_status)
+        self.publish_error = publish_error
+        self.quota_total = quota_total
+        self.quota_usage = quota_usage
+        self.created = []
+        self.published = []
+        self.requests = []  # ("GET", [id]), ("BATCH", [ids]), ("MEDIA", ig), ("PUBLISH", id), ("LIMIT", ig)
+        self.lock = threading.Lock()
+
+    def respond(self, creation_id):
+        """(code HTTP, corps JSON) de la prochaine vérification du conteneur."""
+        with self.lock:
+            responses = self.scripts[creation_id]
+            response = responses.pop(0) if len(responses) > 1 else responses[0]
+        if isinstance(response, dict):
+            return 400, response
+        return 200, {"id": creation_id, "status_code": response, "status": f"{response}: test"}
+
+    def create_container(self, insta_id, form):
+        with self.lock:
+            self.created.append(form)
+            creation_id = f"container-{len(self.created)}"
+            self.scripts[creation_id] = list(self.container_status)
+        return 200, {"id": creation_id}
+
+    def publish(self, insta_id, creation_id):
+        if self.publish_error:
+            return self.publish_error
+        with self.lock:
+            self.published.append(creation_id)
+            self.quota_usage += 1
+        return 200, {"id": f"media-{creation_id}"}
+
+    def publishing_limit(self, insta_id):
+        config = {"quota_total": self.quota_total, "quota_duration": 86400}
+        return 200, {"data": [{"config": config, "quota_usage": self.quota_usage}]}
+
+
+def _handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path.strip("/")
+            if path.endswith("/content_publishing_limit"):
+                insta_id = path.split("/")[0]
+                fake.requests.append(("LIMIT", insta_id))
+                self._send(*fake.publishing_limit(insta_id))
+                return
+            fake.requests.append(("GET", [path]))
+            self._send(*fake.respond(path))
+
+        def do_POST(self):
+            path = urlsplit(self.path).path.strip("/")
+            form = {key: values[0] for key, values in
+                    parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")).items()}
+            if path.endswith("/media"):
+                insta_id = path.split("/")[0]
+                fake.requests.append(("MEDIA", insta_id))
+                self._send(*fake.create_container(insta_id, form))
+            elif path.endswith("/media_publish"):
+                fake.requests.append(("PUBLISH", form["creation_id"]))
+                self._send(*fake.publish(path.split("/")[0], form["creation_id"]))
+            else:
+                batch = json.loads(form["batch"])
+                ids = [urlsplit(item["relative_url"]).path.strip("/") for item in batch]
+                fake.requests.append(("BATCH", ids))
+                responses = []
+                for creation_id in ids:
+                    status, body = fake.respond(creation_id)
+                    responses.append({"code": status, "body": json.dumps(body)})
+                self._send(200, responses)
+
+    return Handler
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """Démarre un faux serveur Graph ; retourne une fonction (scripts, **options) -> (GraphClient, FakeGraph)."""
+    # Attentes courtes pour des tests rapides
+    monkeypatch.setattr(graph_client, "POLL_INITIAL_DELAY", 0.01)
+    monkeypatch.setattr(graph_client, "POLL_MAX_DELAY", 0.05)
+    monkeypatch.setitem(graph_client.POLL_BASE_DEADLINES, "IMAGE", 5)
+    servers = []
+
+    def start(scripts=None, **options):
+        fake = FakeGraph(scripts, **options)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(fake))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        client = GraphClient("test-token", base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        return client, fake
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,24 @@
+"""Invalidation du cache des IDs Instagram Business sur erreur Graph (graph_client)."""
+import pytest
+
+import graph_client
+from graph_client import GraphAPIError, GraphClient
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_client, "BUSINESS_ID_CACHE_FILE", str(tmp_path / "ids.json"))
+    graph_client._update_business_id_cache({"page": {"id": "ig", "resolved_at": graph_client.time.time()}})
+    client = GraphClient("test-token", base_url="http://127.0.0.1:9")
+    client._page_by_insta_id["ig"] = "page"
+    return client
+
+
+def test_transient_error_keeps_page_mapping(client):
+    client._handle_account_error("ig", GraphAPIError("Service unavailable", status_code=500, code=2))
+    assert graph_client.get_cached_business_id("page") == "ig"
+
+    # Une erreur d'authentification ultérieure invalide encore le cache
+    client._handle_account_error("ig", GraphAPIError("Invalid token", status_code=400, code=190))
+    assert graph_client.get_cached_business_id("page") is None
+    assert "ig" not in client._page_by_insta_id
@@ -0,0 +1,47 @@
+"""Scan rapide du premier <img> (rss_publisher.find_first_image_src) comparé à BeautifulSoup."""
+import json
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from rss_publisher import find_first_image_src
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "rss_entries_corpus.json")
+
+# Fragments où le scan rapide doit laisser la main à BeautifulSoup
+FALLBACK_CASES = [
+    '<p>texte</p><!-- commentaire sans fin <img src="cache.jpg"><img src="suite.jpg">',
+    '<!--><img src="a.jpg"><!-- fin -->',
+    '<!---><img src="a.jpg">',
+    '<script>var html = \'<img src="script.jpg">\';',
+    '<STYLE>p { color: red } <img src="style.jpg">',
+    '<![CDATA[<img src="cdata.jpg">]]><img src="apres.jpg">',
+    '</ <img src="fausse-fermeture.jpg"><img src="b.jpg">',
+    '</p <img src="dans-fermeture.jpg">><img src="c.jpg">',
+    '<div<!-- --><img src="d.jpg">',
+    '<div<style></style><img src="e.jpg">',
+]
+
+
+def soup_first_image_src(content_html):
+    img_tag = BeautifulSoup(content_html, 'html.parser').find('img')
+    return img_tag['src'] if img_tag and img_tag.get('src') else None
+
+
+@pytest.mark.parametrize("content_html", FALLBACK_CASES)
+def test_ambiguous_markup_matches_beautifulsoup(content_html):
+    assert find_first_image_src(content_html) == soup_first_image_src(content_html)
+
+
+def test_corpus_matches_beautifulsoup():
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        entries = json.load(f)
+    for entry in entries:
+        content_html = entry.get('description', '') or entry.get('summary', '')
+        assert find_first_image_src(content_html) == soup_first_image_src(content_html), entry['link']
+
+
+def test_comment_and_script_are_skipped():
+    content_html = '<!-- <img src="commentaire.jpg"> --><script><img src="script.jpg"></script><img src="vraie.jpg">'
+    assert find_first_image_src(content_html) == "vraie.jpg"
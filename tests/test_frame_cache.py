@@ -0,0 +1,57 @@
+"""Cache disque des images recadrées (frame_cache)."""
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import frame_cache
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(frame_cache, "FRAME_CACHE_DIR", str(tmp_path / "frames"))
+    path = str(tmp_path / "scene.png")
+    Image.fromarray(np.random.default_rng(0).integers(0, 255, (64, 48, 3), dtype=np.uint8)).save(path)
+    return path
+
+
+def test_second_call_is_memory_mapped(source):
+    first = frame_cache.cached_frame(source, (32, 40))
+    second = frame_cache.cached_frame(source, (32, 40))
+    assert isinstance(second, np.memmap)
+    assert second.shape == (40, 32, 3) and not second.flags.writeable
+    assert np.array_equal(first, second)
+
+
+def test_frame_larger_than_cache_limit(source, monkeypatch):
+    monkeypatch.setattr(frame_cache, "FRAME_CACHE_MAX_MB", 0)
+    frame = frame_cache.cached_frame(source, (32, 40))
+    assert frame is not None and frame.shape == (40, 32, 3)
+
+
+def test_entry_evicted_by_another_process(source, monkeypatch):
+    # Éviction concurrente entre l'écriture de l'entrée et sa relecture
+    monkeypatch.setattr(frame_cache, "_evict", lambda keep=None: os.remove(keep))
+    frame = frame_cache.cached_frame(source, (32, 40))
+    assert frame is not None and frame.shape == (40, 32, 3)
+
+
+def test_unwritable_cache_returns_decoded_frame(source, tmp_path, monkeypatch):
+    # Le répertoire du cache est un fichier : l'écriture échoue, le rendu continue
+    blocker = tmp_path / "blocker"
+    blocker.write_bytes(b"")
+    monkeypatch.setattr(frame_cache, "FRAME_CACHE_DIR", str(blocker / "frames"))
+    frame = frame_cache.cached_frame(source, (32, 40))
+    assert frame.shape == (40, 32, 3) and not frame.flags.writeable
+
+
+def test_source_decoded_once_for_all_sizes(source, monkeypatch):
+    import frame_renderer
+
+    decoded = []
+    monkeypatch.setattr(frame_renderer, "decode_source", lambda path: decoded.append(path) or frame_cache.decode_source(path))
+    sources = frame_renderer.SourceImages()
+    for size in ((32, 40), (40, 40), (40, 32)):
+        assert sources.frame(source, size).shape == (size[1], size[0], 3)
+    assert decoded == [source]
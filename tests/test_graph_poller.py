@@ -0,0 +1,52 @@
+"""
+Poller de statut des conteneurs (graph_client.wait_for_containers) contre le faux serveur
+Graph local de conftest.py : statut final, échec, délai dépassé, erreur temporaire, et
+plusieurs conteneurs vérifiés dans une même requête batch.
+"""
+import graph_client
+from conftest import TRANSIENT_ERROR
+from graph_client import poll_deadline
+
+
+def test_finished_after_in_progress(graph):
+    client, fake = graph({"c1": ["IN_PROGRESS", "IN_PROGRESS", "FINISHED"]})
+    assert client.wait_for_container("c1") is True
+    assert len(fake.requests) == 3
+
+
+def test_error_status_fails_without_waiting_for_deadline(graph):
+    client, fake = graph({"c1": ["IN_PROGRESS", "ERROR"]})
+    assert client.wait_for_container("c1") is False
+    assert len(fake.requests) == 2
+
+
+def test_deadline_exceeded(graph, monkeypatch):
+    monkeypatch.setitem(graph_client.POLL_BASE_DEADLINES, "IMAGE", 0.2)
+    client, fake = graph({"c1": ["IN_PROGRESS"]})
+    assert client.wait_for_container("c1") is False
+    assert len(fake.requests) >= 2
+
+
+def test_transient_error_is_retried(graph):
+    client, fake = graph({"c1": [TRANSIENT_ERROR, TRANSIENT_ERROR, "FINISHED"]})
+    assert client.wait_for_container("c1") is True
+    assert len(fake.requests) == 3
+
+
+def test_containers_checked_together_in_one_batch(graph):
+    client, fake = graph({
+        "c1": ["IN_PROGRESS", "FINISHED"],
+        "c2": ["FINISHED"],
+        "c3": [TRANSIENT_ERROR, "ERROR"],
+    })
+    assert client.wait_for_containers(["c1", "c2", "c3"]) == {"c1": True, "c2": True, "c3": False}
+    # 1er tour : les trois dans un batch ; 2e tour : seulement ceux encore en attente
+    assert fake.requests[0] == ("BATCH", ["c1", "c2", "c3"])
+    assert fake.requests[1] == ("BATCH", ["c1", "c3"])
+    assert len(fake.requests) == 2
+
+
+def test_deadline_grows_with_media_size():
+    base = poll_deadline("REELS")
+    assert poll_deadline("REELS", 100 * 1024 * 1024) > base
+    assert poll_deadline("REELS", 10 ** 12) == graph_client.POLL_MAX_DEADLINE
@@ -0,0 +1,36 @@
+"""Éviction LRU partagée des caches disque (media_cache.evict_lru)."""
+import os
+
+from media_cache import evict_lru
+
+
+def _entries(directory, sizes):
+    paths = []
+    for age, size in enumerate(sizes):
+        path = os.path.join(directory, f"entry_{age}.bin")
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        # Entrée 0 = la moins récemment utilisée
+        os.utime(path, (1000 + age, 1000 + age))
+        paths.append(path)
+    return paths
+
+
+def test_evicts_oldest_beyond_max_entries(tmp_path):
+    paths = _entries(str(tmp_path), [10, 10, 10, 10])
+    evict_lru(str(tmp_path), ".bin", max_entries=2)
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True]
+
+
+def test_evicts_by_total_size_but_keeps_new_entry(tmp_path):
+    paths = _entries(str(tmp_path), [100, 100, 100])
+    evict_lru(str(tmp_path), ".bin", max_bytes=0, keep=paths[0])
+    assert [os.path.exists(p) for p in paths] == [True, False, False]
+
+
+def test_other_suffixes_and_missing_directory_are_ignored(tmp_path):
+    other = tmp_path / "queue.db"
+    other.write_bytes(b"x" * 100)
+    evict_lru(str(tmp_path), ".bin", max_bytes=0)
+    evict_lru(str(tmp_path / "absent"), ".bin", max_entries=0)
+    assert other.exists()
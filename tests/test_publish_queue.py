@@ -0,0 +1,80 @@
+"""
+File de publication (publish_queue) servie par un vrai GraphClient contre le faux serveur Graph
+de conftest.py : quota initialisé depuis content_publishing_limit, réservé avant tout appel Graph,
+erreurs Graph décodées depuis les réponses HTTP.
+"""
+import time
+
+import pytest
+
+from conftest import PUBLISH_LIMIT_ERROR, TRANSIENT_ERROR
+from publish_queue import PublishRateLimiter, connect, enqueue, queue_stats, run_workers
+
+
+@pytest.fixture
+def queue(tmp_path, graph):
+    """Démarre le faux serveur ; retourne une fonction (**options) -> (FakeGraph, run, conn)."""
+    db_path = str(tmp_path / "queue.db")
+    conn = connect(db_path)
+    for i in range(4):
+        enqueue(conn, "ig", f"https://example.com/{i}.jpg", f"caption {i}")
+
+    def start(**options):
+        client, fake = graph(**options)
+
+        def run(**kwargs):
+            return run_workers("ig", "token", db_path=db_path, base_url=client.base_url, **kwargs)
+
+        return fake, run
+
+    yield start, conn
+    conn.close()
+
+
+def jobs(conn):
+    return [dict(row) for row in conn.execute("SELECT * FROM jobs ORDER BY id")]
+
+
+def test_last_token_creates_a_single_container(queue):
+    start, conn = queue
+    fake, run = start(quota_total=25, quota_usage=24)
+    outcomes = run(workers=3)
+    assert ("LIMIT", "ig") in fake.requests
+    assert outcomes == {"published": 1}
+    # Les autres workers n'ont créé aucun conteneur pour des jobs qu'ils n'auraient pas pu publier
+    assert len(fake.created) == 1
+    assert queue_stats(conn) == {"published": 1, "pending": 3}
+
+
+def test_container_error_fails_job_without_retry(queue):
+    start, conn = queue
+    fake, run = start(container_status=("IN_PROGRESS", "ERROR"))
+    limiter = PublishRateLimiter(capacity=25, refill_period=86400, tokens=2)
+    outcomes = run(workers=2, limiter=limiter)
+    assert outcomes == {"failed": 4}
+    assert not fake.published
+    assert all(job["attempts"] == 1 for job in jobs(conn))
+    # Jetons rendus : aucune publication n'a été tentée
+    assert limiter.tokens >= 2
+
+
+def test_transient_publish_error_returns_token(queue):
+    start, conn = queue
+    fake, run = start(publish_error=(500, TRANSIENT_ERROR))
+    limiter = PublishRateLimiter(capacity=25, refill_period=86400, tokens=1)
+    run(workers=1, limiter=limiter)
+    assert limiter.tokens >= 1
+    assert queue_stats(conn)["pending"] == 4
+    assert all("code=2" in job["last_error"] for job in jobs(conn))
+
+
+def test_publish_limit_reschedules_without_consuming_attempts(queue):
+    start, conn = queue
+    fake, run = start(publish_error=(400, PUBLISH_LIMIT_ERROR))
+    outcomes = run(workers=1)
+    # Premier refus : le seau est vidé, les autres jobs ne sont pas réservés
+    assert outcomes == {"pending": 1}
+    job = jobs(conn)[0]
+    assert job["attempts"] == 0
+    assert job["next_attempt_at"] > time.time()
+    assert "subcode=2207042" in job["last_error"]
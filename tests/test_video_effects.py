@@ -0,0 +1,19 @@
+"""Générateur Ken Burns (video_effects.KenBurns) : tampon de sortie réutilisé d'une image à l'autre."""
+import numpy as np
+from PIL import Image
+
+from video_effects import KenBurns
+
+
+def test_frames_reuse_one_buffer_per_scene():
+    source = Image.fromarray(np.random.default_rng(0).integers(0, 255, (40, 32, 3), dtype=np.uint8))
+    scene = KenBurns(None, (32, 40), duration=1.0, fps=10, zoom_end=1.5, buffer=source)
+    first = scene.frame(0.0)
+    expected = np.asarray(source.resize((32, 40), scene.resample, box=tuple(scene.boxes[9])))
+    last = scene.frame(0.9)
+    assert last is first
+    assert np.array_equal(last, expected)
+
+    out = np.empty((40, 32, 3), dtype=np.uint8)
+    assert scene.frame(0.9, out=out) is out
+    assert np.array_equal(out, expected)
@@ -0,0 +1,103 @@
+"""
+Incrustation de textes sur les images d'une vidéo, limitée à la zone du texte.
+
+- Les polices sont chargées une seule fois par (fichier, taille).
+- Chaque texte est rastérisé une seule fois par (texte, police, taille, couleurs, contour,
+  opacité) en un patch RGBA mis en cache : couleurs et alpha en float32, prêts pour le mélange.
+- Le mélange alpha ne touche que la boîte englobante du patch (découpe NumPy), au lieu d'un
+  `CompositeVideoClip` plein cadre recalculé à chaque image.
+"""
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+TEXT_PATCH_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=64)
+def load_font(font_path, font_size):
+    return ImageFont.truetype(font_path, font_size)
+
+
+@lru_cache(maxsize=TEXT_PATCH_CACHE_SIZE)
+def _render_patch(text, font_path, font_size, color, stroke_color, stroke_width, opacity):
+    font = load_font(font_path, font_size)
+    stroke = max(0, round(stroke_width))
+    left, top, right, bottom = font.getbbox(text, stroke_width=stroke)
+    image = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(image).text((-left, -top), text, font=font, fill=color, stroke_width=stroke, stroke_fill=stroke_color)
+    if opacity < 1:
+        image.putalpha(image.getchannel("A").point(lambda a: int(a * opacity)))
+    return image
+
+
+def _patch_key(overlay):
+    return (
+        overlay.text, overlay.font_path, overlay.font_size, overlay.color,
+        overlay.stroke_color, float(overlay.stroke_width), float(overlay.opacity)
+    )
+
+
+def text_patch_image(overlay):
+    """Patch RGBA (PIL) d'un TextOverlay, rastérisé une seule fois. Ne pas modifier l'image retournée."""
+    return _render_patch(*_patch_key(overlay))
+
+
+@lru_cache(maxsize=TEXT_PATCH_CACHE_SIZE)
+def _patch_arrays(*key):
+    rgba = np.asarray(_render_patch(*key), dtype=np.float32)
+    alpha = rgba[..., 3:4] / 255.0
+    # Couleur prémultipliée : le mélange se réduit à roi * (1 - alpha) + premultiplied
+    premultiplied = rgba[..., :3] * alpha
+    alpha.flags.writeable = False
+    premultiplied.flags.writeable = False
+    return premultiplied, alpha
+
+
+def text_patch(overlay):
+    """(couleur prémultipliée float32 HxWx3, alpha float32 HxWx1) d'un TextOverlay, en cache."""
+    return _patch_arrays(*_patch_key(overlay))
+
+
+def overlay_origin(overlay, frame_width, frame_height):
+    """Coin haut-gauche du texte en pixels (position relative au cadre)."""
+    return int(overlay.position[0] * frame_width), int(overlay.position[1] * frame_height)
+
+
+def blend_patch(frame, premultiplied, alpha, x, y):
+    """Mélange le patch dans `frame` (HxWx3 uint8, modifié en place) à partir de (x, y), rogné aux bords."""
+    height, width = frame.shape[:2]
+    patch_h, patch_w = alpha.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + patch_w, width), min(y + patch_h, height)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+    px, py = x0 - x, y0 - y
+    a = alpha[py:py + y1 - y0, px:px + x1 - x0]
+    roi = frame[y0:y1, x0:x1]
+    roi[:] = roi * (1.0 - a) + premultiplied[py:py + y1 - y0, px:px + x1 - x0] + 0.5
+    return frame
+
+
+def composite_text_overlays(frame, overlays, in_place=False):
+    """
+    Retourne l'image avec ses textes incrustés. Par défaut l'image est copiée : MoviePy renvoie
+    le même tableau à chaque image d'un ImageClip. in_place=True pour un tampon dont on est propriétaire.
+    """
+    if not overlays:
+        return frame
+    if not in_place or not frame.flags.writeable:
+        frame = frame.copy()
+    height, width = frame.shape[:2]
+    for overlay in overlays:
+        premultiplied, alpha = text_patch(overlay)
+        x, y = overlay_origin(overlay, width, height)
+        blend_patch(frame, premultiplied, alpha, x, y)
+    return frame
+
+
+def with_text_overlays(clip, overlays):
+    """Clip MoviePy avec textes incrustés sur chaque image (remplace TextClip + CompositeVideoClip)."""
+    overlays = list(overlays)
+    return clip.image_transform(lambda frame: composite_text_overlays(frame, overlays))
@@ -0,0 +1,95 @@
+"""
+Effets vidéo précalculés pour le rendu MoviePy.
+
+Effet Ken Burns (zoom/pan) : au lieu de `clip.resize(lambda t: ...)`, qui rééchantillonne
+l'image Imagen pleine résolution à chaque image de sortie, l'image est réduite une seule fois
+dans un tampon de travail à la résolution de sortie, les rectangles de recadrage de toutes
+les images du clip sont calculés d'avance, puis chaque image de sortie est un seul `resize`
+PIL d'une zone du tampon (coordonnées flottantes : mouvement fluide, sans saccades).
+"""
+import numpy as np
+from PIL import Image
+
+EASINGS = {
+    "linear": lambda u: u,
+    "ease_in": lambda u: u * u,
+    "ease_out": lambda u: 1 - (1 - u) * (1 - u),
+    "ease_in_out": lambda u: u * u * (3 - 2 * u),
+}
+
+
+def fit_image(image, size, resample=Image.LANCZOS):
+    """Redimensionne puis recadre au centre pour remplir exactement `size` (largeur, hauteur)."""
+    width, height = size
+    scale = max(width / image.width, height / image.height)
+    resized = image.resize((max(width, round(image.width * scale)), max(height, round(image.height * scale))), resample)
+    left, top = (resized.width - width) // 2, (resized.height - height) // 2
+    return resized.crop((left, top, left + width, top + height))
+
+
+def ken_burns_boxes(size, duration, fps, zoom_start=1.0, zoom_end=1.04, pan_start=(0.5, 0.5), pan_end=(0.5, 0.5), easing="linear"):
+    """
+    Rectangles de recadrage (gauche, haut, droite, bas), en coordonnées du cadre de sortie,
+    pour chaque image du clip. Le zoom z affiche une zone de taille (largeur/z, hauteur/z)
+    centrée sur le point de pan (relatif), maintenue à l'intérieur du cadre.
+    """
+    if min(zoom_start, zoom_end) < 1:
+        raise ValueError("Le zoom Ken Burns doit rester >= 1 (la zone affichée est prise dans l'image).")
+    width, height = size
+    ease = EASINGS[easing] if isinstance(easing, str) else easing
+    frame_count = max(1, int(round(duration * fps)))
+    # Progression au temps de chaque image (t / durée), comme un zoom exprimé en fonction de t
+    u = np.array([ease(min(1.0, i / (duration * fps))) for i in range(frame_count)])
+
+    zoom = zoom_start + (zoom_end - zoom_start) * u
+    box_w, box_h = width / zoom, height / zoom
+    center_x = (pan_start[0] + (pan_end[0] - pan_start[0]) * u) * width
+    center_y = (pan_start[1] + (pan_end[1] - pan_start[1]) * u) * height
+    left = np.clip(center_x - box_w / 2, 0, width - box_w)
+    top = np.clip(center_y - box_h / 2, 0, height - box_h)
+    return np.stack([left, top, left + box_w, top + box_h], axis=1)
+
+
+class KenBurns:
+    """
+    Générateur d'images Ken Burns pour une image fixe. `frame(t)` retourne un tableau
+    (hauteur, largeur, 3) uint8 prêt pour MoviePy ; `clip()` construit le VideoClip.
+    Sans `out`, le tableau retourné est le même tampon à chaque appel (alloué une fois par
+    scène) : l'image précédente est écrasée, copier le tableau pour la conserver.
+    """
+
+    def __init__(self, image_path, size, duration, fps, zoom_start=1.0, zoom_end=1.04,
+                 pan_start=(0.5, 0.5), pan_end=(0.5, 0.5), easing="linear", resample=Image.BILINEAR, buffer=None):
+        self.size = tuple(size)
+        self.duration = duration
+        self.fps = fps
+        self.resample = resample
+
+        # Tampon de travail : une seule réduction de l'original, à la résolution de sortie
+        # (ou tampon déjà préparé, partagé entre plusieurs rendus)
+        if buffer is None:
+            with Image.open(image_path) as img:
+                buffer = fit_image(img.convert("RGB"), self.size)
+        self.buffer = buffer
+        self.boxes = ken_burns_boxes(self.size, duration, fps, zoom_start, zoom_end, pan_start, pan_end, easing)
+        self._out = None
+
+    def frame(self, t, out=None):
+        """Image à l'instant t, écrite dans `out` (tampon uint8 de l'appelant) ou dans le tampon de la scène."""
+        index = min(int(round(t * self.fps)), len(self.boxes) - 1)
+        box = tuple(self.boxes[max(0, index)])
+        if out is None:
+            if self._out is None:
+                self._out = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+            out = self._out
+        np.copyto(out, self.buffer.resize(self.size, self.resample, box=box))
+        return out
+
+    def clip(self):
+        from moviepy import VideoClip
+        return VideoClip(frame_function=self.frame, duration=self.duration)
+
+
+def ken_burns_clip(image_path, size, duration, fps, zoom_rate=0.04, easing="linear", **kwargs):
+    """Zoom avant de 1 à 1 + zoom_rate * durée (équivalent de `resize(lambda t: 1 + zoom_rate * t)`)."""
+    return KenBurns(image_path, size, duration, fps, 1.0, 1.0 + zoom_rate * duration, easing=easing, **kwargs).clip()
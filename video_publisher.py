@@ -1,17 +1,16 @@
 import os
-import requests
 import json
-import time  
-from google import genai
+import requests
 from google.genai.errors import APIError
 
+from gcp_clients import get_gemini_client
+from graph_client import GraphAPIError, get_graph_client
+
 # --- 1. Configuration et Clés (Secrets GitHub) ---
 PAGE_ID = os.getenv("FB_PAGE_ID")
 ACCESS_TOKEN = os.getenv("FB_ACCESS_TOKEN") 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") 
 
-GRAPH_BASE_URL = "https://graph.facebook.com/v18.0"
-
 # --- Liste des sujets pour votre média ---
 POST_TOPICS = [
     "La percée de l'IA dans l'analyse financière pour les PME.",
@@ -30,7 +29,7 @@ def generate_ai_content_and_caption(topic):
     
     # Générer la description (texte)
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = get_gemini_client()
         prompt = (
             f"Génère une légende vidéo Instagram percutante et factuelle sur le sujet : '{topic}'. "
             "Le ton doit être visuel et inviter à l'action. "
@@ -52,50 +51,36 @@ def generate_ai_content_and_caption(topic):
 
 def get_instagram_business_id():
     """Récupère l'ID du compte Instagram Business lié à la Page Facebook."""
-    url = f"{GRAPH_BASE_URL}/{PAGE_ID}?fields=instagram_business_account&access_token={ACCESS_TOKEN}"
+    try:
+        insta_id = get_graph_client(ACCESS_TOKEN).get_instagram_business_id(PAGE_ID)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la requête d'ID Instagram : {e}")
+        return None
     
+    if not insta_id:
+        print("❌ Erreur: Compte Instagram Business non trouvé.")
+    return insta_id
+
+def get_media_size(media_url):
+    """Taille du média en octets (Content-Length d'une requête HEAD), ou None si inconnue."""
     try:
-        r = requests.get(url)
-        r.raise_for_status()
-        data = r.json()
-        
-        if 'instagram_business_account' in data:
-            return data['instagram_business_account']['id']
-        else:
-            print("❌ Erreur: Compte Instagram Business non trouvé.")
-            return None
-    except requests.exceptions.HTTPError as e:
-        print(f"❌ Échec de la requête d'ID Instagram (HTTP): {e}")
+        r = requests.head(media_url, allow_redirects=True, timeout=10)
+        content_length = r.headers.get('Content-Length', '')
+        return int(content_length) if r.ok and content_length.isdigit() else None
+    except requests.exceptions.RequestException:
         return None
 
-def check_media_status(creation_id, access_token):
-    """Vérifie l'état d'encodage du conteneur vidéo (boucle d'attente prolongée)."""
-    
-    status_url = f"{GRAPH_BASE_URL}/{creation_id}?fields=status_code&access_token={access_token}"
-    
-    # Augmentation de la limite d'attente à 3 minutes (36 * 5 secondes)
-    max_checks = 36  
+def check_media_status(creation_id, access_token, size_bytes=None):
+    """
+    Vérifie l'état d'encodage du conteneur vidéo (poller adaptatif partagé) ; le délai maximal
+    croît avec la taille de la vidéo (`size_bytes`).
+    """
+    
+    if get_graph_client(access_token).wait_for_container(creation_id, "REELS", size_bytes):
+        print("   ✅ Vidéo prête à être publiée.")
+        return True
     
-    for i in range(max_checks):
-        r = requests.get(status_url)
-        data = r.json()
-        
-        status = data.get('status_code')
-        
-        print(f"   [Vérification {i+1}/{max_checks}] Statut de la vidéo: {status}")
-        
-        if status == 'FINISHED':
-            print("   ✅ Vidéo prête à être publiée.")
-            return True
-        
-        if status == 'ERROR':
-            print("   ❌ Erreur d'encodage de la vidéo.")
-            return False
-            
-        # Attendre 5 secondes avant la prochaine vérification
-        time.sleep(5) 
-        
-    print(f"   ❌ Délai d'attente dépassé ({max_checks * 5} secondes). Annulation de la publication.")
+    print("   ❌ Vidéo non encodée. Annulation de la publication.")
     return False
 
 
@@ -103,56 +88,38 @@ def publish_instagram_media(insta_id, video_url, caption):
     """Effectue la publication vidéo en deux étapes sur Instagram avec vérification du statut."""
     
     print("\n--- Début de la publication vidéo sur Instagram (Processus en 2 étapes) ---")
+    graph = get_graph_client(ACCESS_TOKEN)
     
     # 1. CRÉER LE CONTENEUR MÉDIA
     print("Étape 1/2: Création du conteneur média...")
-    media_container_url = f"{GRAPH_BASE_URL}/{insta_id}/media"
-    
-    container_payload = {
-        "media_type": "REELS",           
-        "video_url": video_url,          
-        "caption": caption,
-        "access_token": ACCESS_TOKEN
-    }
-    
-    r1 = requests.post(media_container_url, data=container_payload)
-    data1 = r1.json()
-    
-    if r1.status_code != 200 or 'id' not in data1:
-        print(f"❌ Échec de la création du conteneur. Statut: {r1.status_code}")
-        print("Erreur Meta (Conteneur Vidéo):", json.dumps(data1, indent=4))
+    try:
+        creation_id = graph.create_media_container(insta_id, video_url, caption, "REELS")
+    except GraphAPIError as e:
+        print(f"❌ Échec de la création du conteneur. Statut: {e.status_code}")
+        print("Erreur Meta (Conteneur Vidéo):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
         
-    creation_id = data1['id']
     print(f"✅ Conteneur vidéo créé avec ID: {creation_id}")
     
-    # VÉRIFICATION DE L'ÉTAT DU CONTENEUR
-    if not check_media_status(creation_id, ACCESS_TOKEN):
+    # VÉRIFICATION DE L'ÉTAT DU CONTENEUR (délai adapté à la taille de la vidéo)
+    if not check_media_status(creation_id, ACCESS_TOKEN, get_media_size(video_url)):
         return False
     
     # 2. PUBLIER LE CONTENEUR MÉDIA
     print("\nÉtape 2/2: Publication du conteneur...")
-    publish_url = f"{GRAPH_BASE_URL}/{insta_id}/media_publish"
-    
-    publish_payload = {
-        "creation_id": creation_id,
-        "access_token": ACCESS_TOKEN
-    }
-    
-    r2 = requests.post(publish_url, data=publish_payload)
-    data2 = r2.json()
-    
-    if r2.status_code == 200 and 'id' in data2:
-        print("\n" + "="*50)
-        print("✅ PUBLICATION VIDÉO INSTAGRAM DÉCLENCHÉE AVEC SUCCÈS !")
-        print("La vidéo devrait apparaître sur Instagram d'ici quelques instants.")
-        print("==================================================")
-        return True
-    else:
-        print(f"❌ Échec de la publication finale Instagram. Statut: {r2.status_code}")
-        print("Erreur Meta (Publication Vidéo):", json.dumps(data2, indent=4))
+    try:
+        graph.publish_container(insta_id, creation_id)
+    except GraphAPIError as e:
+        print(f"❌ Échec de la publication finale Instagram. Statut: {e.status_code}")
+        print("Erreur Meta (Publication Vidéo):", json.dumps(e.payload, indent=4) if e.payload else e)
         return False
 
+    print("\n" + "="*50)
+    print("✅ PUBLICATION VIDÉO INSTAGRAM DÉCLENCHÉE AVEC SUCCÈS !")
+    print("La vidéo devrait apparaître sur Instagram d'ici quelques instants.")
+    print("==================================================")
+    return True
+
 
 # --- 4. Main Execution ---
 